@@ -10,8 +10,10 @@ def create_app(config_filename: str = 'config.dev.json') -> Flask:
     from app.models.categoria import Categoria
     from app.models.produto import Produto
     from app.models.juncoes import ProdutoCategoria
-    from app.utils import as_localtime, existe_esquema
-    from .modules import bootstrap, csrf, db
+    from app.imagens.placeholder import pre_renderizar
+    from app.utils import as_localtime, configurar_engine, configurar_sqlite, existe_esquema
+    from .modules import (bootstrap, categoria_cache, csrf, db, derivados, fotos, instrumentacao,
+                          thumbnail_cache)
     # Desativar as mensagens do servidor HTTP
     # https://stackoverflow.com/a/18379764
     logging.getLogger('werkzeug').setLevel(logging.ERROR)
@@ -44,15 +46,23 @@ def create_app(config_filename: str = 'config.dev.json') -> Flask:
 
     app.logger.debug("Registrando as extensões")
     bootstrap.init_app(app)
+    configurar_engine(app)
     db.init_app(app)
+    categoria_cache.init_app(app, db)
     csrf.init_app(app)
+    thumbnail_cache.init_app(app)
+    fotos.init_app(app)
+    derivados.init_app(app, cache=thumbnail_cache)
+    instrumentacao.init_app(app, db)
 
     with app.app_context():
         if not existe_esquema(app):
             app.logger.critical("É necessário fazer a migração/upgrade do banco")
             sys.exit(1)
 
-        if Categoria.is_empty():
+        configurar_sqlite(app, db.engine)
+
+        if categoria_cache.snapshot().vazio:
             categorias = ["Bebidas", "Carnes", "Padaria",
                           "Laticínios", "Hortifruti"]
             for c in categorias:
@@ -61,6 +71,9 @@ def create_app(config_filename: str = 'config.dev.json') -> Flask:
                 db.session.add(categoria)
             db.session.commit()
 
+    app.logger.debug("Pré-renderizando as imagens de produto sem foto")
+    pre_renderizar(app.config.get('PLACEHOLDER_TAMANHOS', [64, 128, 256]))
+
     @app.route('/')
     @app.route('/index')
     def index():
@@ -68,11 +81,21 @@ def create_app(config_filename: str = 'config.dev.json') -> Flask:
                                title="Página principal")
 
     app.logger.debug("Registrando as blueprints")
+    from app.routes.api import bp as api_bp
     from app.routes.categoria import bp as categoria_bp
     from app.routes.produto import bp as produto_bp
+    # A API recebe JSON de outros sistemas, sem o token CSRF dos formulários
+    csrf.exempt(api_bp)
+    app.register_blueprint(api_bp)
     app.register_blueprint(categoria_bp)
     app.register_blueprint(produto_bp)
 
+    app.logger.debug("Registrando os comandos")
+    from app.commands.fotos import fotos_cli
+    from app.commands.produtos import produtos_cli
+    app.cli.add_command(fotos_cli)
+    app.cli.add_command(produtos_cli)
+
     # Formatando as datas para horário local
     # https://stackoverflow.com/q/65359968
     app.logger.debug("Registrando filtros no Jinja2")
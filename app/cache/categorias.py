@@ -0,0 +1,166 @@
+import base64
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import NamedTuple
+
+import sqlalchemy as sa
+from sqlalchemy import event
+
+
+class ItemCategoria(NamedTuple):
+    id: str
+    nome: str
+
+
+@dataclass(frozen=True)
+class SnapshotCategorias:
+    """Retrato imutável das categorias, ordenadas pelo nome"""
+    geracao: int
+    itens: tuple[ItemCategoria, ...]
+    ids: frozenset[str]
+    # Posição permanente (Categoria.ordem) de cada categoria, usada em codificar
+    ordinais: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def vazio(self) -> bool:
+        return not self.itens
+
+    def codificar(self, selecionadas) -> str:
+        """
+        Representação compacta de um subconjunto das categorias: um bit por
+        categoria, na posição da sua ordem (Categoria.ordem), em base64. A
+        ordem de uma categoria nunca muda nem é reaproveitada, então o valor
+        continua válido entre gerações e após migrações que recriam a tabela
+        """
+        bits = sum(1 << self.ordinais[item.id] for item in self.itens
+                   if item.id in selecionadas and item.id in self.ordinais)
+        dados = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+        return base64.urlsafe_b64encode(dados).decode().rstrip('=')
+
+    def decodificar(self, valor) -> frozenset[str]:
+        """
+        Subconjunto representado por ``valor`` (ver codificar). Categorias
+        removidas saem do subconjunto; valores ausentes, inválidos ou que não
+        representam nenhuma categoria existente representam todas as
+        categorias
+        """
+        if not isinstance(valor, str):
+            return self.ids
+        try:
+            bits = int.from_bytes(base64.b64decode(valor + '=' * (-len(valor) % 4),
+                                                   altchars=b'-_', validate=True),
+                                  'little')
+        except ValueError:
+            return self.ids
+        selecionadas = frozenset(item.id for item in self.itens
+                                 if item.id in self.ordinais
+                                 and bits >> self.ordinais[item.id] & 1)
+        return selecionadas or self.ids
+
+
+class CategoriaCache:
+    """
+    Cache, em memória, da lista de categorias (id e nome) usada nos formulários
+    e nos filtros da listagem de produtos.
+
+    Commits que incluem, alteram ou removem categorias, pela sessão ou com
+    INSERT/UPDATE/DELETE em lote, incrementam um contador de geração
+    compartilhado entre os processos. O contador é o tamanho do arquivo
+    ``<instância>/<CATEGORIAS_GERACAO_ARQUIVO>``: cada alteração acrescenta um
+    byte (O_APPEND é atômico entre processos), e cada processo só precisa de um
+    stat() para saber se o seu retrato ficou desatualizado.
+    """
+
+    def __init__(self, app=None, db=None):
+        self.arquivo: Path | None = None
+        self._db = None
+        self._snapshot: SnapshotCategorias | None = None
+        self._lock = threading.Lock()
+        self._eventos_registrados = False
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self._db = db
+        self.arquivo = Path(app.instance_path) / app.config.get('CATEGORIAS_GERACAO_ARQUIVO',
+                                                                'categorias.geracao')
+        self._snapshot = None
+        if not self._eventos_registrados:
+            event.listen(db.session, 'after_flush', self._apos_flush)
+            event.listen(db.session, 'do_orm_execute', self._apos_execucao)
+            event.listen(db.session, 'after_commit', self._apos_commit)
+            event.listen(db.session, 'after_rollback', self._apos_rollback)
+            self._eventos_registrados = True
+        app.extensions['categoria_cache'] = self
+
+    @property
+    def geracao(self) -> int:
+        try:
+            return self.arquivo.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def snapshot(self) -> SnapshotCategorias:
+        """Retrato atual das categorias, recarregado só se outra geração foi publicada"""
+        geracao = self.geracao
+        atual = self._snapshot
+        if atual is not None and atual.geracao == geracao:
+            return atual
+        with self._lock:
+            atual = self._snapshot
+            if atual is None or atual.geracao != geracao:
+                atual = self._carregar(geracao)
+                self._snapshot = atual
+        return atual
+
+    def invalidar(self):
+        """Publica uma nova geração, descartando o retrato de todos os processos"""
+        self._snapshot = None
+        self.arquivo.parent.mkdir(parents=True, exist_ok=True)
+        descritor = os.open(self.arquivo, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(descritor, b'.')
+        finally:
+            os.close(descritor)
+
+    def _carregar(self, geracao: int) -> SnapshotCategorias:
+        from app.models.categoria import Categoria  # evita importação circular
+        linhas = self._db.session.execute(
+            sa.select(Categoria.id, Categoria.nome, Categoria.ordem).
+            order_by(Categoria.nome)
+        ).all()
+        itens = tuple(ItemCategoria(str(linha[0]), linha[1]) for linha in linhas)
+        return SnapshotCategorias(geracao=geracao,
+                                  itens=itens,
+                                  ids=frozenset(item.id for item in itens),
+                                  ordinais={str(linha[0]): linha[2] for linha in linhas
+                                            if linha[2] is not None})
+
+    @staticmethod
+    def _eh_categoria(mapper) -> bool:
+        return mapper is not None and mapper.local_table.name == 'categorias'
+
+    def _apos_flush(self, session, _contexto):
+        # Categorias que aparecem em session.dirty só porque a coleção de
+        # produtos mudou (associação com produtos) não alteram o retrato
+        alteradas = (
+            [*session.new, *session.deleted] +
+            [o for o in session.dirty if session.is_modified(o, include_collections=False)]
+        )
+        if any(self._eh_categoria(sa.inspect(o).mapper) for o in alteradas):
+            session.info['categorias_alteradas'] = True
+
+    def _apos_execucao(self, estado):
+        if ((estado.is_insert or estado.is_update or estado.is_delete)
+                and self._eh_categoria(estado.bind_mapper)):
+            estado.session.info['categorias_alteradas'] = True
+
+    def _apos_commit(self, session):
+        if session.info.pop('categorias_alteradas', False):
+            self.invalidar()
+
+    @staticmethod
+    def _apos_rollback(session):
+        session.info.pop('categorias_alteradas', None)
@@ -0,0 +1,193 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+
+class ThumbnailCache:
+    """
+    Cache em disco das miniaturas dos produtos, dentro da pasta da instância.
+
+    Cada entrada é identificada por (id do produto, hash do conteúdo da foto,
+    tamanho) e fica em ``<diretorio>/<id do produto>/<hash>_<tamanho>``. Quando
+    o total de bytes passa do limite configurado, as entradas usadas há mais
+    tempo são descartadas (LRU).
+
+    O diretório é compartilhado pelos processos (workers) do servidor, e o
+    limite vale para o diretório todo: antes de descartar entradas, e em
+    gravações feitas pelo menos ``THUMBNAIL_CACHE_REVARREDURA`` segundos após
+    a varredura anterior, o índice do processo é refeito a partir dos
+    arquivos, incluindo os gravados pelos outros. Entre duas varreduras, o
+    diretório pode passar do limite só pelo que os outros processos gravaram
+    nesse intervalo; com 0, toda gravação refaz o índice. A ordem LRU é a data
+    de modificação dos arquivos, atualizada a cada acerto.
+    """
+
+    def __init__(self, app=None):
+        self.diretorio: Path | None = None
+        self.limite_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entradas: OrderedDict[tuple[str, str], int] = OrderedDict()
+        self._total_bytes = 0
+        self.intervalo_varredura = 1.0
+        self._ultima_varredura = 0.0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.diretorio = Path(app.instance_path) / app.config.get('THUMBNAIL_CACHE_DIR',
+                                                                  'thumbnails')
+        self.limite_bytes = int(app.config.get('THUMBNAIL_CACHE_MAX_BYTES',
+                                               64 * 1024 * 1024))
+        self.intervalo_varredura = float(app.config.get('THUMBNAIL_CACHE_REVARREDURA', 1))
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self._carregar_indice()
+        app.extensions['thumbnail_cache'] = self
+
+    def _carregar_indice(self):
+        # Reconstrói a ordem LRU a partir da data de modificação dos arquivos,
+        # que é atualizada a cada acerto. Outros processos podem estar
+        # gravando ou removendo arquivos durante a varredura
+        encontrados = []
+        for pasta in self.diretorio.iterdir():
+            try:
+                if not pasta.is_dir():
+                    continue
+                arquivos = list(pasta.iterdir())
+            except FileNotFoundError:
+                continue
+            for arquivo in arquivos:
+                if arquivo.name.startswith('.'):
+                    continue
+                try:
+                    info = arquivo.stat()
+                except FileNotFoundError:
+                    continue
+                encontrados.append((info.st_mtime, (pasta.name, arquivo.name), info.st_size))
+        encontrados.sort()
+        with self._lock:
+            self._entradas.clear()
+            self._total_bytes = 0
+            for _, chave, tamanho in encontrados:
+                self._entradas[chave] = tamanho
+                self._total_bytes += tamanho
+            self._ultima_varredura = time.monotonic()
+
+    @staticmethod
+    def _chave(produto_id: uuid.UUID | str,
+               foto_hash: str,
+               size: int) -> tuple[str, str]:
+        return str(produto_id), f"{foto_hash}_{size}"
+
+    def _caminho(self, chave: tuple[str, str]) -> Path:
+        return self.diretorio / chave[0] / chave[1]
+
+    def get(self, produto_id: uuid.UUID | str, foto_hash: str, size: int) -> bytes | None:
+        chave = self._chave(produto_id, foto_hash, size)
+        caminho = self._caminho(chave)
+        try:
+            conteudo = caminho.read_bytes()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+                tamanho = self._entradas.pop(chave, None)
+                if tamanho is not None:
+                    self._total_bytes -= tamanho
+            return None
+
+        try:
+            os.utime(caminho)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self.hits += 1
+            if chave in self._entradas:
+                self._entradas.move_to_end(chave)
+            else:
+                # Arquivo gravado por outro processo
+                self._entradas[chave] = len(conteudo)
+                self._total_bytes += len(conteudo)
+        return conteudo
+
+    def contains(self, produto_id: uuid.UUID | str, foto_hash: str, size: int) -> bool:
+        """Indica se a miniatura está no cache, sem contar como acerto ou falha"""
+        return self._caminho(self._chave(produto_id, foto_hash, size)).is_file()
+
+    def put(self, produto_id: uuid.UUID | str, foto_hash: str, size: int, conteudo: bytes):
+        if len(conteudo) > self.limite_bytes:
+            return
+        chave = self._chave(produto_id, foto_hash, size)
+        caminho = self._caminho(chave)
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+
+        # Grava em arquivo temporário e renomeia, para que leitores
+        # concorrentes nunca vejam um arquivo pela metade
+        descritor, temporario = tempfile.mkstemp(dir=caminho.parent, prefix='.tmp')
+        try:
+            with os.fdopen(descritor, 'wb') as saida:
+                saida.write(conteudo)
+            os.replace(temporario, caminho)
+        except OSError:
+            Path(temporario).unlink(missing_ok=True)
+            raise
+
+        with self._lock:
+            anterior = self._entradas.pop(chave, None)
+            if anterior is not None:
+                self._total_bytes -= anterior
+            self._entradas[chave] = len(conteudo)
+            self._total_bytes += len(conteudo)
+            varrer = (self._total_bytes > self.limite_bytes or
+                      time.monotonic() - self._ultima_varredura >= self.intervalo_varredura)
+        if varrer:
+            # O total deste processo não inclui o que os outros gravaram
+            self._carregar_indice()
+        with self._lock:
+            descartadas = self._descartar()
+
+        for descartada in descartadas:
+            self._caminho(descartada).unlink(missing_ok=True)
+
+    def _descartar(self) -> list[tuple[str, str]]:
+        # Deve ser chamado com o lock adquirido
+        descartadas = []
+        while self._total_bytes > self.limite_bytes and self._entradas:
+            chave, tamanho = self._entradas.popitem(last=False)
+            self._total_bytes -= tamanho
+            self.evictions += 1
+            descartadas.append(chave)
+        return descartadas
+
+    def invalidate(self, produto_id: uuid.UUID | str):
+        """Remove todas as miniaturas de um produto"""
+        pasta = str(produto_id)
+        with self._lock:
+            for chave in [c for c in self._entradas if c[0] == pasta]:
+                self._total_bytes -= self._entradas.pop(chave)
+        shutil.rmtree(self.diretorio / pasta, ignore_errors=True)
+
+    def stats(self) -> dict:
+        """
+        Entradas e bytes do diretório (de todos os processos); acertos, falhas
+        e descartes deste processo
+        """
+        self._carregar_indice()
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / consultas, 4) if consultas else None,
+                'evictions': self.evictions,
+                'entradas': len(self._entradas),
+                'bytes': self._total_bytes,
+                'limite_bytes': self.limite_bytes,
+                'processo': os.getpid(),
+            }
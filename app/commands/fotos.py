@@ -0,0 +1,69 @@
+import time
+from base64 import b64decode
+
+import click
+import sqlalchemy as sa
+from flask.cli import AppGroup
+
+from app.models.produto import Produto
+from app.modules import db, fotos
+
+fotos_cli = AppGroup('fotos', help="Manutenção do repositório de fotos dos produtos")
+
+
+@fotos_cli.command('migrar')
+@click.option('--lote', default=200, show_default=True,
+              help="Quantidade de produtos migrados por transação")
+@click.option('--vacuum/--sem-vacuum', default=False, show_default=True,
+              help="Executar VACUUM ao final para devolver o espaço ao sistema de arquivos")
+def migrar(lote, vacuum):
+    """Move as fotos em base64 da tabela de produtos para o repositório de fotos"""
+    produtos = Produto.__table__
+    pendentes = produtos.c.foto_base64.is_not(None)
+    total = db.session.execute(
+        sa.select(sa.func.count()).select_from(produtos).where(pendentes)
+    ).scalar_one()
+    if not total:
+        click.echo("Nenhuma foto para migrar")
+        return
+
+    # A data de atualização é preservada: a foto continua a mesma
+    atualizacao = (produtos.update().
+                   where(produtos.c.id == sa.bindparam('b_id')).
+                   values(foto_hash=sa.bindparam('b_hash'),
+                          foto_base64=None,
+                          dta_atualizacao=produtos.c.dta_atualizacao))
+    migrados = 0
+    inicio = time.perf_counter()
+    while True:
+        registros = db.session.execute(
+            sa.select(produtos.c.id, produtos.c.foto_base64).where(pendentes).limit(lote)
+        ).all()
+        if not registros:
+            break
+        db.session.execute(atualizacao,
+                           [{'b_id': produto_id, 'b_hash': fotos.put(b64decode(foto_base64))}
+                            for produto_id, foto_base64 in registros])
+        db.session.commit()
+        migrados += len(registros)
+        click.echo(f"{migrados}/{total} fotos migradas")
+
+    click.echo(f"Migração concluída em {time.perf_counter() - inicio:.1f}s")
+    if vacuum:
+        click.echo("Executando VACUUM")
+        with db.engine.connect() as conexao:
+            conexao.exec_driver_sql("VACUUM")
+
+
+@fotos_cli.command('limpar')
+def limpar():
+    """Remove do repositório as fotos que não pertencem a nenhum produto"""
+    em_uso = set(db.session.execute(
+        sa.select(Produto.foto_hash).where(Produto.foto_hash.is_not(None)).distinct()
+    ).scalars())
+    removidas = 0
+    for foto_hash in list(fotos.hashes()):
+        if foto_hash not in em_uso:
+            fotos.delete(foto_hash)
+            removidas += 1
+    click.echo(f"{removidas} fotos removidas")
@@ -0,0 +1,192 @@
+import csv
+import json
+import time
+import uuid
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+import click
+import sqlalchemy as sa
+from flask.cli import AppGroup
+
+from app.exportacao import FORMATOS, gerar, sentenca_catalogo
+from app.imagens.ingestao import FotoIngerida, ingerir_arquivo
+from app.models.categoria import Categoria
+from app.models.juncoes import ProdutoCategoria
+from app.models.produto import Produto
+from app.modules import db, fotos
+
+produtos_cli = AppGroup('produtos', help="Importação e exportação do catálogo de produtos")
+
+VERDADEIROS = {'1', 'true', 't', 'sim', 's', 'yes', 'y'}
+
+
+def _ler_registros(arquivo, formato: str, separador: str):
+    """
+    Gera (número da linha, registro) sem carregar o arquivo inteiro. No JSONL
+    o registro é a linha ainda sem decodificar (ver _decodificar), para que
+    uma linha inválida rejeite só aquele registro
+    """
+    if formato == 'csv':
+        for numero, linha in enumerate(csv.DictReader(arquivo), start=2):
+            categorias = linha.get('categorias') or ''
+            linha['categorias'] = [c.strip() for c in categorias.split(separador) if c.strip()]
+            yield numero, linha
+    else:
+        for numero, linha in enumerate(arquivo, start=1):
+            if linha.strip():
+                yield numero, linha
+
+
+def _decodificar(registro) -> dict:
+    if isinstance(registro, str):
+        registro = json.loads(registro)
+    if not isinstance(registro, dict):
+        raise ValueError("o registro deve ser um objeto JSON")
+    return registro
+
+
+def _converter(registro: dict, base: Path) -> tuple[dict, FotoIngerida | None]:
+    """
+    Valida o registro e devolve o produto e a foto já processada (ou None).
+    A foto só é gravada no repositório depois que o registro todo é aceito
+    """
+    nome = registro.get('nome') or ''
+    if not isinstance(nome, str):
+        raise ValueError("o nome deve ser um texto")
+    nome = nome.strip()
+    if not nome or len(nome) > 100:
+        raise ValueError("o nome é obrigatório e pode ter até 100 caracteres")
+    try:
+        preco = Decimal(str(registro.get('preco', '0')).strip() or '0')
+    except InvalidOperation:
+        raise ValueError(f"preço inválido: {registro.get('preco')!r}")
+    if not preco.is_finite():
+        raise ValueError(f"preço inválido: {registro.get('preco')!r}")
+    if preco < 0:
+        raise ValueError("os preços devem ser positivos")
+    estoque = registro.get('estoque') or 0
+    if isinstance(estoque, str) and estoque.strip().lstrip('+-').isdigit():
+        estoque = int(estoque)
+    if not isinstance(estoque, int) or isinstance(estoque, bool):
+        raise ValueError(f"o estoque deve ser um número inteiro: {registro.get('estoque')!r}")
+    if estoque < 0:
+        raise ValueError("o estoque precisa ser positivo")
+    ativo = registro.get('ativo', True)
+    if isinstance(ativo, str):
+        ativo = ativo.strip().lower() in VERDADEIROS
+
+    produto = {'id': uuid.uuid4(), 'nome': nome, 'preco': preco, 'estoque': estoque,
+               'ativo': bool(ativo), 'possui_foto': False, 'foto_base64': None,
+               'foto_mime': None, 'foto_hash': None,
+               'foto_tamanho_original': None, 'foto_tamanho': None}
+    foto = ingerir_arquivo(base / registro['foto']) if registro.get('foto') else None
+    return produto, foto
+
+
+@produtos_cli.command('importar')
+@click.argument('arquivo', type=click.File('r', encoding='utf-8'))
+@click.option('--formato', type=click.Choice(['csv', 'jsonl']), default=None,
+              help="Formato do arquivo (padrão: deduzido da extensão)")
+@click.option('--lote', default=5000, show_default=True,
+              help="Quantidade de produtos inseridos por transação")
+@click.option('--separador-categorias', default='|', show_default=True,
+              help="Separador dos nomes de categoria na coluna 'categorias' do CSV")
+@click.option('--criar-categorias', is_flag=True, default=False,
+              help="Criar as categorias que ainda não existem")
+def importar(arquivo, formato, lote, separador_categorias, criar_categorias):
+    """
+    Importa produtos de um arquivo CSV ou JSONL.
+
+    Campos: nome, preco, estoque, ativo, categorias (nomes) e foto (caminho
+    do arquivo, relativo ao arquivo importado).
+    """
+    if formato is None:
+        formato = 'jsonl' if arquivo.name.endswith(('.jsonl', '.ndjson')) else 'csv'
+    base = Path(arquivo.name).parent
+
+    # As categorias são resolvidas uma única vez
+    categorias = {nome: categoria_id for categoria_id, nome in
+                  db.session.execute(sa.select(Categoria.id, Categoria.nome)).all()}
+
+    produtos, juncoes = [], []
+    importados = rejeitados = 0
+    inicio = time.perf_counter()
+
+    def gravar():
+        nonlocal importados, produtos, juncoes
+        if not produtos:
+            return
+        db.session.execute(sa.insert(Produto), produtos)
+        if juncoes:
+            db.session.execute(sa.insert(ProdutoCategoria), juncoes)
+        db.session.commit()
+        importados += len(produtos)
+        produtos, juncoes = [], []
+        decorrido = time.perf_counter() - inicio
+        click.echo(f"{importados} produtos importados ({importados / decorrido:.0f} linhas/s)")
+
+    for numero, registro in _ler_registros(arquivo, formato, separador_categorias):
+        try:
+            registro = _decodificar(registro)
+            produto, foto = _converter(registro, base)
+            nomes = registro.get('categorias') or []
+            if not isinstance(nomes, list) or not all(isinstance(n, str) for n in nomes):
+                raise ValueError("as categorias devem ser uma lista de nomes")
+            if not nomes:
+                raise ValueError("o produto precisa de pelo menos uma categoria")
+            if not criar_categorias:
+                inexistentes = [nome for nome in nomes if nome not in categorias]
+                if inexistentes:
+                    raise ValueError(f"categoria inexistente: '{inexistentes[0]}'")
+        except (ValueError, TypeError, ArithmeticError, OSError) as e:
+            rejeitados += 1
+            click.echo(f"Linha {numero} rejeitada: {e}", err=True)
+            continue
+
+        ids = set()
+        for nome in nomes:
+            if nome not in categorias:
+                categoria_id = uuid.uuid4()
+                db.session.execute(sa.insert(Categoria), [{'id': categoria_id, 'nome': nome}])
+                categorias[nome] = categoria_id
+            ids.add(categorias[nome])
+        if foto is not None:
+            produto.update(possui_foto=True,
+                           foto_mime=foto.mime,
+                           foto_hash=fotos.put(foto.conteudo),
+                           foto_tamanho_original=foto.tamanho_original,
+                           foto_tamanho=foto.tamanho)
+
+        produtos.append(produto)
+        juncoes.extend({'produto_id': produto['id'], 'categoria_id': categoria_id}
+                       for categoria_id in ids)
+        if len(produtos) >= lote:
+            gravar()
+    gravar()
+
+    decorrido = time.perf_counter() - inicio
+    click.echo(f"Importação concluída: {importados} produtos em {decorrido:.1f}s "
+               f"({importados / decorrido if decorrido else 0:.0f} linhas/s), "
+               f"{rejeitados} linhas rejeitadas")
+
+
+@produtos_cli.command('exportar')
+@click.option('--formato', type=click.Choice(list(FORMATOS)), default='csv', show_default=True)
+@click.option('--categoria', 'categorias', multiple=True,
+              help="Exportar apenas os produtos desta categoria (pode ser repetido)")
+@click.option('--saida', '-o', type=click.File('w', encoding='utf-8'), default='-',
+              help="Arquivo de saída (padrão: saída padrão)")
+@click.option('--lote', default=1000, show_default=True,
+              help="Quantidade de linhas lidas do banco por vez")
+def exportar(formato, categorias, saida, lote):
+    """Exporta os produtos, com os nomes das suas categorias, em CSV ou JSONL"""
+    categorias_ids = []
+    if categorias:
+        categorias_ids = db.session.execute(
+            sa.select(Categoria.id).where(Categoria.nome.in_(categorias))
+        ).scalars().all()
+        if not categorias_ids:
+            raise click.ClickException("Nenhuma das categorias informadas existe")
+    for pedaco in gerar(formato, sentenca_catalogo(categorias_ids, formato), lote):
+        saida.write(pedaco)
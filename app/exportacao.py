@@ -0,0 +1,80 @@
+import csv
+import io
+import json
+from typing import Iterator
+
+import sqlalchemy as sa
+
+from app.models.categoria import Categoria
+from app.models.juncoes import ProdutoCategoria
+from app.models.produto import Produto
+from app.modules import db
+
+CAMPOS = ('id', 'nome', 'preco', 'estoque', 'ativo', 'categorias')
+FORMATOS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def sentenca_catalogo(categorias_ids=None, formato: str = 'csv'):
+    """
+    Produtos com os nomes das suas categorias, sem as colunas da foto.
+
+    As categorias vêm de uma subconsulta correlacionada por produto (que usa
+    a chave primária da junção), de modo que o SQLite percorre os produtos na
+    ordem do índice do nome e as linhas podem ser enviadas assim que lidas,
+    sem ordenar ou agrupar o catálogo inteiro antes. No CSV as categorias são
+    separadas por "|", como espera o comando de importação; no JSONL formam
+    uma lista
+    """
+    if formato == 'jsonl':
+        agregado = sa.func.json_group_array(Categoria.nome)
+    else:
+        agregado = sa.func.group_concat(Categoria.nome, '|')
+    categorias = (sa.select(agregado).
+                  select_from(ProdutoCategoria).
+                  join(Categoria, Categoria.id == ProdutoCategoria.categoria_id).
+                  where(ProdutoCategoria.produto_id == Produto.id).
+                  scalar_subquery())
+    sentenca = (sa.select(Produto.id, Produto.nome, Produto.preco, Produto.estoque,
+                          Produto.ativo, categorias.label('categorias')).
+                order_by(Produto.nome, Produto.id))
+    if categorias_ids:
+        sentenca = sentenca.where(Produto.filtro_categorias(categorias_ids))
+    return sentenca
+
+
+def _blocos(sentenca, chunk: int):
+    resultado = db.session.execute(sentenca.execution_options(yield_per=chunk))
+    yield from resultado.partitions()
+
+
+def gerar_csv(sentenca, chunk: int = 1000) -> Iterator[str]:
+    """Gera o CSV em pedaços de ``chunk`` linhas"""
+    saida = io.StringIO()
+    escritor = csv.writer(saida)
+    escritor.writerow(CAMPOS)
+    for bloco in _blocos(sentenca, chunk):
+        for produto_id, nome, preco, estoque, ativo, categorias in bloco:
+            escritor.writerow((produto_id, nome, preco, estoque,
+                               'true' if ativo else 'false', categorias or ''))
+        yield saida.getvalue()
+        saida.seek(0)
+        saida.truncate()
+    yield saida.getvalue()
+
+
+def gerar_jsonl(sentenca, chunk: int = 1000) -> Iterator[str]:
+    """Gera um objeto JSON por linha, em pedaços de ``chunk`` linhas"""
+    for bloco in _blocos(sentenca, chunk):
+        yield ''.join(
+            json.dumps({'id': str(produto_id), 'nome': nome, 'preco': str(preco),
+                        'estoque': estoque, 'ativo': ativo,
+                        'categorias': json.loads(categorias) if categorias else []},
+                       ensure_ascii=False) + '\n'
+            for produto_id, nome, preco, estoque, ativo, categorias in bloco)
+
+
+def gerar(formato: str, sentenca, chunk: int = 1000) -> Iterator[str]:
+    return gerar_jsonl(sentenca, chunk) if formato == 'jsonl' else gerar_csv(sentenca, chunk)
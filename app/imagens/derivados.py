@@ -0,0 +1,139 @@
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+from app.instrumentacao import medir_etapa
+
+logger = logging.getLogger(__name__)
+
+
+@medir_etapa('imagem')
+def gerar_thumbnail(conteudo: bytes, size: int) -> bytes:
+    """Miniatura da foto, no mesmo formato do original, cabendo em size x size"""
+    saida = io.BytesIO()
+    entrada = Image.open(io.BytesIO(conteudo))
+    formato = entrada.format
+    (largura, altura) = entrada.size
+    fator = min(size/largura, size/altura)
+    novo_tamanho = (int(largura * fator), int(altura * fator))
+    entrada.thumbnail(novo_tamanho)
+    entrada.save(saida, format=formato)
+    return saida.getvalue()
+
+
+def gerar_thumbnails(conteudo: bytes, tamanhos) -> dict[int, bytes]:
+    # Executada nos processos do pool: precisa ser uma função de módulo
+    return {size: gerar_thumbnail(conteudo, size) for size in tamanhos}
+
+
+class GeradorDerivados:
+    """
+    Gera, em um pool de processos, as miniaturas dos tamanhos padrão
+    (``THUMBNAIL_TAMANHOS_PADRAO``) logo após o upload de uma foto, gravando-as
+    no cache de miniaturas. O trabalho de CPU do PIL fica fora do processo
+    que atende as requisições (e do seu GIL). Enquanto a geração está
+    pendente, a rota de miniaturas continua gerando a imagem na hora. A rota
+    só aceita esses tamanhos.
+
+    ``THUMBNAIL_WORKERS`` define o tamanho do pool; com 0, nada é gerado
+    antecipadamente.
+    """
+
+    PENDENTE = 'pendente'
+    ERRO = 'erro'
+
+    def __init__(self, app=None):
+        self.tamanhos: tuple[int, ...] = ()
+        self.workers = 0
+        self._cache = None
+        self._pool: ProcessPoolExecutor | None = None
+        self._pool_pid: int | None = None
+        self._status: dict[tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, cache=None):
+        self.tamanhos = tuple(int(t) for t in app.config.get('THUMBNAIL_TAMANHOS_PADRAO',
+                                                              [64, 128, 256]))
+        self.workers = int(app.config.get('THUMBNAIL_WORKERS',
+                                          max(1, (os.cpu_count() or 2) // 2)))
+        self._cache = cache if cache is not None else app.extensions['thumbnail_cache']
+        app.extensions['gerador_derivados'] = self
+
+    def _executor(self) -> ProcessPoolExecutor:
+        # O pool é criado no primeiro uso, dentro do processo que atende as
+        # requisições (e não no processo mestre do servidor, antes do fork)
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'))
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def agendar(self, produto_id: uuid.UUID | str, foto_hash: str, conteudo: bytes) -> None:
+        """
+        Enfileira a geração das miniaturas padrão de uma foto recém-enviada.
+        Como é chamada depois do commit do produto, nunca levanta exceções: se
+        o pool falhar, a geração fica com erro e a rota de miniaturas gera as
+        imagens na hora
+        """
+        if not self.workers or not self.tamanhos:
+            return
+        chave = (str(produto_id), foto_hash)
+        with self._lock:
+            self._status[chave] = self.PENDENTE
+        try:
+            futuro = self._executor().submit(gerar_thumbnails, conteudo, self.tamanhos)
+        except Exception as e:
+            logger.error("Falha ao agendar as miniaturas de %s: %s", chave[0], e)
+            with self._lock:
+                if isinstance(e, BrokenProcessPool):
+                    # Um novo pool será criado no próximo agendamento
+                    self._pool = None
+                self._status[chave] = self.ERRO
+            return
+        futuro.add_done_callback(lambda f: self._concluir(chave, f))
+
+    def _concluir(self, chave: tuple[str, str], futuro) -> None:
+        try:
+            for size, miniatura in futuro.result().items():
+                self._cache.put(chave[0], chave[1], size, miniatura)
+        except BrokenProcessPool as e:
+            logger.warning("Pool de geração de miniaturas interrompido: %s", e)
+            with self._lock:
+                # Um novo pool será criado no próximo agendamento
+                self._pool = None
+                if chave in self._status:
+                    self._status[chave] = self.ERRO
+        except Exception as e:
+            logger.warning("Falha ao gerar as miniaturas de %s: %s", chave[0], e)
+            with self._lock:
+                # Apenas se a foto não foi trocada de novo nesse meio tempo
+                if chave in self._status:
+                    self._status[chave] = self.ERRO
+        else:
+            # Gerações concluídas não precisam ser lembradas: as miniaturas
+            # estão no cache
+            with self._lock:
+                self._status.pop(chave, None)
+
+    def descartar(self, produto_id: uuid.UUID | str) -> None:
+        """Esquece a situação das gerações de um produto (foto trocada ou removida)"""
+        produto_id = str(produto_id)
+        with self._lock:
+            for chave in [c for c in self._status if c[0] == produto_id]:
+                del self._status[chave]
+
+    def status(self, produto_id: uuid.UUID | str, foto_hash: str) -> str | None:
+        """'pendente', 'erro' ou None (concluída ou nunca agendada)"""
+        with self._lock:
+            return self._status.get((str(produto_id), foto_hash))
@@ -0,0 +1,101 @@
+import io
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO
+
+from flask import current_app
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app.instrumentacao import medir_etapa
+
+# Formatos de armazenamento: (formato do PIL, tipo MIME, opções do save)
+FORMATOS = {
+    'webp': ('WEBP', 'image/webp', {'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'progressive': True, 'optimize': True}),
+}
+MIMES_ORIGINAIS = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+}
+TAMANHO_BLOCO = 64 * 1024
+
+
+class FotoInvalida(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class FotoIngerida:
+    conteudo: bytes
+    mime: str
+    tamanho_original: int
+
+    @property
+    def tamanho(self) -> int:
+        return len(self.conteudo)
+
+
+def _copiar_com_limite(origem: BinaryIO, destino: BinaryIO, limite: int) -> int:
+    total = 0
+    while bloco := origem.read(TAMANHO_BLOCO):
+        total += len(bloco)
+        if total > limite:
+            raise FotoInvalida(f"A foto deve ter no máximo {limite // (1024 * 1024)} MB")
+        destino.write(bloco)
+    return total
+
+
+@medir_etapa('imagem')
+def ingerir(origem: BinaryIO) -> FotoIngerida:
+    """
+    Prepara uma foto enviada para armazenamento.
+
+    O conteúdo é copiado em blocos para um arquivo temporário, respeitando o
+    limite FOTO_TAMANHO_MAXIMO (bytes), sem manter o original inteiro na
+    memória. A imagem é então reorientada conforme o EXIF, reduzida para
+    caber em FOTO_DIMENSAO_MAXIMA pixels e gravada novamente sem metadados,
+    no formato original ou, conforme FOTO_FORMATO, em WebP ou JPEG
+    progressivo (com a qualidade FOTO_QUALIDADE).
+    """
+    config = current_app.config
+    limite = int(config.get('FOTO_TAMANHO_MAXIMO', 10 * 1024 * 1024))
+    dimensao = int(config.get('FOTO_DIMENSAO_MAXIMA', 1600))
+    formato = config.get('FOTO_FORMATO', 'original')
+    qualidade = int(config.get('FOTO_QUALIDADE', 85))
+
+    with tempfile.SpooledTemporaryFile(max_size=TAMANHO_BLOCO * 16) as temporario:
+        tamanho_original = _copiar_com_limite(origem, temporario, limite)
+        temporario.seek(0)
+        try:
+            with Image.open(temporario) as imagem:
+                formato_original = imagem.format
+                # Em JPEGs, decodifica direto em uma escala reduzida
+                imagem.draft(imagem.mode, (dimensao, dimensao))
+                imagem = ImageOps.exif_transpose(imagem)
+                imagem.thumbnail((dimensao, dimensao))
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+            raise FotoInvalida("O arquivo enviado não é uma imagem válida")
+
+    if formato in FORMATOS:
+        formato_pil, mime, opcoes = FORMATOS[formato]
+    elif formato_original in MIMES_ORIGINAIS:
+        formato_pil, mime, opcoes = formato_original, MIMES_ORIGINAIS[formato_original], {}
+    else:
+        raise FotoInvalida("Apenas fotos JPG ou PNG")
+
+    if formato_pil == 'JPEG' and imagem.mode not in ('RGB', 'L'):
+        imagem = imagem.convert('RGB')
+    if formato_pil != 'PNG':
+        opcoes = {**opcoes, 'quality': qualidade}
+
+    # Gravar sem EXIF/ICC/comentários do arquivo enviado, preservando apenas
+    # a transparência
+    imagem.info = {k: v for k, v in imagem.info.items() if k == 'transparency'}
+    saida = io.BytesIO()
+    imagem.save(saida, format=formato_pil, **opcoes)
+    return FotoIngerida(saida.getvalue(), mime, tamanho_original)
+
+
+def ingerir_arquivo(caminho) -> FotoIngerida:
+    with open(caminho, 'rb') as arquivo:
+        return ingerir(arquivo)
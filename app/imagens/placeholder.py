@@ -0,0 +1,56 @@
+import io
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+from app.instrumentacao import medir_etapa
+
+# Tamanho da imagem "Produto sem foto" servida no lugar da foto em tamanho real
+TAMANHO_IMAGEM = 480
+
+
+@lru_cache(maxsize=8)
+def _fonte(tamanho: int):
+    # Tentar usar fonte padrão, ou fallback para fonte básica
+    try:
+        return ImageFont.truetype("arial.ttf", tamanho)
+    except OSError:
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=64)
+@medir_etapa('imagem')
+def _renderizar(size: int, texto: str, tamanho_fonte: int) -> bytes:
+    saida = io.BytesIO()
+    entrada = Image.new('RGB', (size, size), (128, 128, 128))
+    draw = ImageDraw.Draw(entrada)
+    fonte = _fonte(tamanho_fonte)
+
+    # Calcular posição centralizada do texto
+    bbox = draw.textbbox((0, 0), texto, font=fonte, align='center')
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
+    posicao = ((size - text_width) / 2, (size - text_height) / 2)
+
+    # Desenhar o texto em branco
+    draw.text(posicao, texto, fill=(255, 255, 255), font=fonte, align='center')
+    entrada.save(saida, format="PNG")
+    return saida.getvalue()
+
+
+def imagem_sem_foto() -> bytes:
+    """PNG "Produto sem foto" no tamanho da imagem completa"""
+    return _renderizar(TAMANHO_IMAGEM, "Produto sem foto", 32)
+
+
+def thumbnail_sem_foto(size: int) -> bytes:
+    """PNG "Produto sem foto" para miniaturas, memorizado por tamanho"""
+    # Ajustar tamanho da fonte baseado no tamanho da thumbnail
+    return _renderizar(size, "Produto\nsem foto", max(10, int(size / 8)))
+
+
+def pre_renderizar(tamanhos) -> None:
+    """Preenche o cache com a imagem completa e as miniaturas mais usadas"""
+    imagem_sem_foto()
+    for size in tamanhos:
+        thumbnail_sem_foto(int(size))
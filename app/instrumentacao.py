@@ -0,0 +1,198 @@
+import cProfile
+import functools
+import hmac
+import json
+import re
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from flask import before_render_template, current_app, g, has_request_context, request, \
+    template_rendered
+from sqlalchemy import event
+
+# Listas de parâmetros de tamanho variável (IN (?, ?, ...)) têm a mesma forma
+_LISTA_DE_PARAMETROS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+# Consultas com vários parâmetros no IN são cargas em lote (selectinload,
+# yield_per), não N+1
+_CARGA_EM_LOTE = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)')
+
+
+@dataclass
+class Medicao:
+    """Medidas de uma requisição, guardadas em ``g.medicao``"""
+    inicio: float
+    consultas: int = 0
+    tempo_sql: float = 0.0
+    etapas: defaultdict = field(default_factory=lambda: defaultdict(float))
+    formas: Counter = field(default_factory=Counter)
+    inicio_template: float | None = None
+    perfil: cProfile.Profile | None = None
+
+
+def _medicao_atual() -> Medicao | None:
+    return g.get('medicao') if has_request_context() else None
+
+
+def medir_etapa(nome: str):
+    """
+    Decorador que soma o tempo da função à etapa ``nome`` da requisição atual,
+    quando a instrumentação está ligada. Fora de requisições (comandos, pool
+    de processos) não faz nada
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            medicao = _medicao_atual()
+            if medicao is None:
+                return funcao(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                medicao.etapas[nome] += time.perf_counter() - inicio
+        return envoltorio
+    return decorador
+
+
+class Instrumentacao:
+    """
+    Instrumentação opcional (``INSTRUMENTACAO``) das requisições: tempo total,
+    quantidade e tempo das consultas SQL, tempo de renderização dos templates
+    e das etapas marcadas com ``medir_etapa`` (processamento de imagens). As
+    medidas vão para o cabeçalho ``Server-Timing`` e para uma linha de log em
+    JSON.
+
+    Também avisa quando a mesma consulta se repete mais de
+    ``INSTRUMENTACAO_N_MAIS_1`` vezes numa requisição (provável N+1) e, se
+    ``INSTRUMENTACAO_PERFIL_TOKEN`` estiver definido, grava o perfil (cProfile)
+    das requisições que trouxerem o token no cabeçalho ``X-Perfil``. O log
+    e o perfil são finalizados quando a resposta é fechada, incluindo o
+    trabalho feito durante o streaming; o ``Server-Timing``, não.
+    """
+
+    def __init__(self, app=None, db=None):
+        self.limite_repeticoes = 10
+        self.token_perfil = ''
+        self.diretorio_perfis: Path | None = None
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        app.extensions['instrumentacao'] = self
+        if not app.config.get('INSTRUMENTACAO', False):
+            return
+        self.limite_repeticoes = int(app.config.get('INSTRUMENTACAO_N_MAIS_1', 10))
+        self.token_perfil = app.config.get('INSTRUMENTACAO_PERFIL_TOKEN', '')
+        self.diretorio_perfis = Path(app.instance_path) / app.config.get('INSTRUMENTACAO_PERFIL_DIR',
+                                                                         'perfis')
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._antes_da_consulta)
+            event.listen(db.engine, 'after_cursor_execute', self._depois_da_consulta)
+        before_render_template.connect(self._antes_do_template, app)
+        template_rendered.connect(self._depois_do_template, app)
+        app.before_request(self._iniciar)
+        app.after_request(self._finalizar)
+
+    @staticmethod
+    def _antes_da_consulta(conexao, _cursor, _sentenca, _parametros, _contexto, _executemany):
+        if _medicao_atual() is not None:
+            conexao.info.setdefault('instrumentacao_inicio', []).append(time.perf_counter())
+
+    @staticmethod
+    def _depois_da_consulta(conexao, _cursor, sentenca, _parametros, _contexto, _executemany):
+        medicao = _medicao_atual()
+        inicios = conexao.info.get('instrumentacao_inicio')
+        if medicao is None or not inicios:
+            return
+        medicao.tempo_sql += time.perf_counter() - inicios.pop()
+        medicao.consultas += 1
+        if not _CARGA_EM_LOTE.search(sentenca):
+            medicao.formas[_LISTA_DE_PARAMETROS.sub('(?)', sentenca)] += 1
+
+    @staticmethod
+    def _antes_do_template(_app, **_extra):
+        medicao = _medicao_atual()
+        if medicao is not None:
+            medicao.inicio_template = time.perf_counter()
+
+    @staticmethod
+    def _depois_do_template(_app, **_extra):
+        medicao = _medicao_atual()
+        if medicao is not None and medicao.inicio_template is not None:
+            medicao.etapas['template'] += time.perf_counter() - medicao.inicio_template
+            medicao.inicio_template = None
+
+    def _perfil_solicitado(self) -> bool:
+        token = request.headers.get('X-Perfil', '')
+        return bool(self.token_perfil) and bool(token) and hmac.compare_digest(token,
+                                                                               self.token_perfil)
+
+    def _iniciar(self):
+        g.medicao = Medicao(inicio=time.perf_counter())
+        if self._perfil_solicitado():
+            g.medicao.perfil = cProfile.Profile()
+            g.medicao.perfil.enable()
+
+    def _finalizar(self, resposta):
+        medicao = _medicao_atual()
+        if medicao is None:
+            return resposta
+        arquivo_perfil = None
+        if medicao.perfil is not None:
+            arquivo_perfil = self._arquivo_perfil()
+            resposta.headers['X-Perfil-Arquivo'] = arquivo_perfil.name
+
+        # Em respostas em streaming (pp=all), o cabeçalho só cobre o que foi
+        # feito antes do início do corpo
+        total = time.perf_counter() - medicao.inicio
+        metricas = [f'total;dur={total * 1000:.1f}',
+                    f'sql;dur={medicao.tempo_sql * 1000:.1f};desc="{medicao.consultas} consultas"']
+        metricas += [f'{nome};dur={segundos * 1000:.1f}'
+                     for nome, segundos in medicao.etapas.items()]
+        resposta.headers['Server-Timing'] = ', '.join(metricas)
+
+        # O perfil e o log só são finalizados ao fechar a resposta, para
+        # incluir o que é consultado e renderizado durante o streaming
+        logger = current_app.logger
+        endpoint, metodo, caminho = request.endpoint, request.method, request.full_path
+        status = resposta.status_code
+        resposta.call_on_close(
+            lambda: self._encerrar(logger, medicao, arquivo_perfil,
+                                   endpoint, metodo, caminho, status))
+        return resposta
+
+    def _encerrar(self, logger, medicao: Medicao, arquivo_perfil: Path | None,
+                  endpoint, metodo, caminho, status):
+        if medicao.perfil is not None:
+            medicao.perfil.disable()
+            self.diretorio_perfis.mkdir(parents=True, exist_ok=True)
+            medicao.perfil.dump_stats(arquivo_perfil)
+            logger.info("Perfil da requisição %s gravado em %s", caminho.rstrip('?'),
+                        arquivo_perfil)
+        self._registrar(logger, medicao, endpoint, metodo, caminho, status)
+
+    def _registrar(self, logger, medicao: Medicao, endpoint, metodo, caminho, status):
+        registro = {
+            'endpoint': endpoint,
+            'metodo': metodo,
+            'caminho': caminho.rstrip('?'),
+            'status': status,
+            'total_ms': round((time.perf_counter() - medicao.inicio) * 1000, 1),
+            'sql_consultas': medicao.consultas,
+            'sql_ms': round(medicao.tempo_sql * 1000, 1),
+            **{f'{nome}_ms': round(segundos * 1000, 1) for nome, segundos in medicao.etapas.items()},
+        }
+        logger.info("Requisição %s", json.dumps(registro, ensure_ascii=False))
+        for forma, vezes in medicao.formas.most_common():
+            if vezes <= self.limite_repeticoes:
+                break
+            logger.warning("Possível N+1 em %s: consulta repetida %d vezes: %s",
+                           endpoint, vezes, ' '.join(forma.split())[:300])
+
+    def _arquivo_perfil(self) -> Path:
+        nome = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{request.endpoint or 'desconhecido'}.pstats"
+        return self.diretorio_perfis / nome
@@ -1,8 +1,8 @@
 import uuid
-from typing import Optional, Self
+from typing import Iterable, Optional, Self
 
 import sqlalchemy as sa
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm import load_only, Mapped, mapped_column
 from sqlalchemy.types import DateTime
 
 from app.modules import db
@@ -29,33 +29,46 @@ class BasicRepositoryMixin:
         return not db.session.execute(sa.select(cls).limit(1)).scalar_one_or_none()
 
     @classmethod
-    def get_by_id(cls, cls_id) -> Self | None:
+    def _opcoes_de_carga(cls, campos: Iterable[str] | None, opcoes: Iterable) -> list:
+        """
+        Opções da consulta: ``campos`` limita as colunas carregadas (load_only),
+        para consultas leves; as demais são carregadas sob demanda
+        """
+        opcoes = list(opcoes)
+        if campos:
+            opcoes.append(load_only(*(getattr(cls, campo) for campo in campos)))
+        return opcoes
+
+    @classmethod
+    def get_by_id(cls,
+                  cls_id,
+                  campos: Iterable[str] | None = None,
+                  opcoes: Iterable = ()) -> Self | None:
         try:
             obj_id = uuid.UUID(str(cls_id))
         except ValueError:
             obj_id = cls_id
-        return db.session.get(cls, obj_id)
+        return db.session.get(cls, obj_id, options=cls._opcoes_de_carga(campos, opcoes))
 
     @classmethod
     def get_first_or_none_by(cls,
                              atributo: str,
                              valor: str | int | uuid.UUID,
-                             casesensitive: bool = True) -> Self | None:
+                             casesensitive: bool = True,
+                             campos: Iterable[str] | None = None,
+                             opcoes: Iterable = ()) -> Self | None:
         registro = None
         if hasattr(cls, atributo):
+            sentenca = sa.select(cls).options(*cls._opcoes_de_carga(campos, opcoes)).limit(1)
             if casesensitive:
                 registro = db.session.execute(
-                    sa.select(cls).
-                    where(getattr(cls, atributo) == valor).
-                    limit(1)
+                    sentenca.where(getattr(cls, atributo) == valor)
                 ).scalar_one_or_none()
             else:
                 if isinstance(valor, str):
                     # noinspection PyTypeChecker
                     registro = db.session.execute(
-                        sa.select(cls).
-                        where(sa.func.lower(getattr(cls, atributo)) == sa.func.lower(valor)).
-                        limit(1)
+                        sentenca.where(sa.func.lower(getattr(cls, atributo)) == sa.func.lower(valor))
                     ).scalar_one_or_none()
                 else:
                     raise TypeError("Para a operação case insensitive, o "
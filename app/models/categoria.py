@@ -1,8 +1,12 @@
 import uuid
-from sqlalchemy import String, Uuid
+
+import sqlalchemy as sa
+from sqlalchemy import Integer, String, Uuid
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.models.base_mixin import (BasicRepositoryMixin,
                                    TimeStampMixin)
+from app.models.juncoes import ProdutoCategoria
+from app.models.produto import Produto
 from app.modules import db
 
 
@@ -13,8 +17,91 @@ class Categoria(db.Model, BasicRepositoryMixin, TimeStampMixin):
                                      default=uuid.uuid4)
     nome: Mapped[str] = mapped_column(String(128),
                                       nullable=False)
+    # Número permanente, atribuído pelo banco (gatilho) na inclusão e nunca
+    # reaproveitado. Ver SnapshotCategorias.codificar
+    ordem: Mapped[int | None] = mapped_column(Integer,
+                                              nullable=True,
+                                              index=True,
+                                              unique=True)
 
     lista_de_produtos = relationship('Produto',
                                      secondary='produto_categoria',
                                      back_populates='categorias',
                                      lazy='select')
+
+    @classmethod
+    def lista_com_contagem(cls) -> list[sa.Row]:
+        """
+        Categorias ordenadas pelo nome, com a quantidade de produtos de cada
+        uma, contadas na tabela de junção sem carregar os produtos
+        """
+        sentenca = (sa.select(cls.id,
+                              cls.nome,
+                              sa.func.count(ProdutoCategoria.produto_id).label('total_produtos')).
+                    outerjoin(ProdutoCategoria, ProdutoCategoria.categoria_id == cls.id).
+                    group_by(cls.id, cls.nome).
+                    order_by(cls.nome))
+        return db.session.execute(sentenca).all()
+
+    def amostra_produtos(self, k: int = 5) -> tuple[list[sa.Row], int]:
+        """
+        Até k produtos aleatórios desta categoria (apenas id e nome) e o total
+        de produtos da categoria, sem materializar a lista de produtos
+        """
+        total = db.session.execute(
+            sa.select(sa.func.count()).
+            select_from(ProdutoCategoria).
+            where(ProdutoCategoria.categoria_id == self.id)
+        ).scalar_one()
+        if not total or k <= 0:
+            return [], total
+        amostra = db.session.execute(
+            sa.select(Produto.id, Produto.nome).
+            join(ProdutoCategoria, ProdutoCategoria.produto_id == Produto.id).
+            where(ProdutoCategoria.categoria_id == self.id).
+            order_by(sa.func.random()).
+            limit(k)
+        ).all()
+        return amostra, total
+
+    def produtos_exclusivos(self, limite: int | None = None) -> tuple[list[str], int]:
+        """
+        Os primeiros ``limite`` nomes (em ordem alfabética) e o total dos
+        produtos cuja única categoria é esta, ou seja, que ficariam sem
+        categoria se ela fosse removida
+        """
+        desta_categoria = (sa.select(ProdutoCategoria.produto_id).
+                           where(ProdutoCategoria.categoria_id == self.id))
+        exclusivos = (sa.select(ProdutoCategoria.produto_id).
+                      where(ProdutoCategoria.produto_id.in_(desta_categoria)).
+                      group_by(ProdutoCategoria.produto_id).
+                      having(sa.func.count() == 1))
+        total = db.session.execute(
+            sa.select(sa.func.count()).select_from(exclusivos.subquery())
+        ).scalar_one()
+        if not total:
+            return [], 0
+        nomes = db.session.execute(
+            sa.select(Produto.nome).
+            where(Produto.id.in_(exclusivos)).
+            order_by(Produto.nome).
+            limit(limite)
+        ).scalars().all()
+        return nomes, total
+
+    def remover(self) -> None:
+        """
+        Remove a categoria e as suas associações com produtos usando DELETEs
+        em lote, sem carregar a lista de produtos
+        """
+        db.session.execute(
+            sa.delete(ProdutoCategoria).
+            where(ProdutoCategoria.categoria_id == self.id).
+            execution_options(synchronize_session=False)
+        )
+        db.session.execute(
+            sa.delete(Categoria).
+            where(Categoria.id == self.id).
+            execution_options(synchronize_session=False)
+        )
+        db.session.expunge(self)
@@ -1,4 +1,4 @@
-from sqlalchemy import ForeignKey, Uuid
+from sqlalchemy import ForeignKey, Index, Uuid
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.modules import db
@@ -6,6 +6,11 @@ from app.modules import db
 
 class ProdutoCategoria(db.Model):
     __tablename__ = 'produto_categoria'
+    # A chave primária atende as buscas por produto; este índice atende as
+    # buscas por categoria (filtros, contagens e remoção)
+    __table_args__ = (
+        Index('ix_produto_categoria_categoria_id', 'categoria_id', 'produto_id'),
+    )
     produto_id: Mapped[Uuid] = mapped_column(Uuid(as_uuid=True),
                                               ForeignKey('produtos.id'),
                                               primary_key=True)
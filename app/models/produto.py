@@ -1,14 +1,27 @@
-import io
+import re
 import uuid
 from base64 import b64decode
+from datetime import timezone
 
-from PIL import Image
+from flask import current_app
 
+import sqlalchemy as sa
 from sqlalchemy import Boolean, DECIMAL, ForeignKey, Integer, String, Text, Uuid
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from app.modules import db
+from sqlalchemy.orm import (joinedload, lazyload, Mapped, mapped_column, relationship,
+                            selectinload, subqueryload)
+from app.imagens.derivados import gerar_thumbnail
+from app.imagens.placeholder import imagem_sem_foto, thumbnail_sem_foto
+from app.models.juncoes import ProdutoCategoria
+from app.modules import db, fotos
+from app.utils import converter_uuids
 from app.models.base_mixin import BasicRepositoryMixin, TimeStampMixin
 
+# Índice de busca textual no nome dos produtos, criado e mantido (por gatilhos)
+# pelas migrações. Cada linha guarda o id do produto
+produtos_fts = sa.table('produtos_fts',
+                        sa.column('produto_id', Uuid(as_uuid=True)),
+                        sa.column('rank', sa.Float))
+
 
 class Produto(db.Model, BasicRepositoryMixin, TimeStampMixin):
     __tablename__ = 'produtos'
@@ -18,92 +31,190 @@ class Produto(db.Model, BasicRepositoryMixin, TimeStampMixin):
     estoque = mapped_column(Integer, default=0)
     ativo = mapped_column(Boolean, default=True, nullable=False)
     possui_foto = mapped_column(Boolean, default=False, nullable=False)
-    foto_base64 = mapped_column(Text, default=None, nullable=True)
-    foto_mime = mapped_column(String(64), nullable=True, default=None)
+    # Formato legado: as fotos novas ficam no repositório de fotos (app.modules.fotos),
+    # referenciadas por foto_hash. Ver o comando "flask fotos migrar"
+    # As colunas do grupo "foto" não são carregadas com o produto: só as rotas
+    # de imagens as pedem, com undefer_group('foto')
+    foto_base64 = mapped_column(Text, default=None, nullable=True,
+                                deferred=True, deferred_group='foto')
+    foto_mime = mapped_column(String(64), nullable=True, default=None,
+                              deferred=True, deferred_group='foto')
+    foto_hash = mapped_column(String(64), nullable=True, default=None, index=True)
+    # Tamanhos, em bytes, do arquivo enviado e da foto armazenada
+    foto_tamanho_original = mapped_column(Integer, nullable=True, default=None)
+    foto_tamanho = mapped_column(Integer, nullable=True, default=None)
 
     categorias = relationship('Categoria',
                               secondary='produto_categoria',
                               back_populates='lista_de_produtos')
 
-    @property
-    def imagem(self):
-        if not self.possui_foto:
-            from PIL import ImageDraw, ImageFont
-
-            saida = io.BytesIO()
-            entrada = Image.new('RGB', (480, 480), (128, 128, 128))
-
-            # Adicionar texto "Produto sem foto"
-            draw = ImageDraw.Draw(entrada)
-            texto = "Produto sem foto"
-
-            # Tentar usar fonte padrão, ou fallback para fonte básica
-            try:
-                fonte = ImageFont.truetype("arial.ttf", 32)
-            except:
-                fonte = ImageFont.load_default()
+    # Estratégias de carga das categorias nas listagens de produtos
+    # (configuração PRODUTO_CATEGORIAS_LOADER)
+    CATEGORIAS_LOADERS = {
+        'selectin': selectinload,
+        'joined': joinedload,
+        'subquery': subqueryload,
+        'lazy': lazyload,
+    }
+
+    @classmethod
+    def carregar_categorias(cls):
+        """
+        Opção de carga para listagens que exibem as categorias de cada produto,
+        evitando uma consulta extra por produto (N+1)
+        """
+        estrategia = current_app.config.get('PRODUTO_CATEGORIAS_LOADER', 'selectin')
+        try:
+            loader = cls.CATEGORIAS_LOADERS[estrategia]
+        except KeyError:
+            raise ValueError(f"Estratégia de carga de categorias desconhecida: '{estrategia}'")
+        return loader(cls.categorias)
+
+    @classmethod
+    def filtro_categorias(cls, categorias_ids, para_contagem: bool = False):
+        """
+        Condição "pertence a pelo menos uma das categorias", como semi-join na
+        tabela de junção, sem multiplicar as linhas do produto (dispensando o
+        DISTINCT).
+
+        Para listagens, a condição é um EXISTS correlacionado: o SQLite
+        percorre os produtos pelo índice do nome e para assim que a página
+        está completa. Para contagens, onde a ordem não importa, é um
+        ``IN (SELECT ...)``, que parte do índice (categoria_id, produto_id)
+        """
+        if para_contagem:
+            return cls.id.in_(sa.select(ProdutoCategoria.produto_id).
+                              where(ProdutoCategoria.categoria_id.in_(categorias_ids)))
+        return sa.exists().where(ProdutoCategoria.produto_id == cls.id,
+                                 ProdutoCategoria.categoria_id.in_(categorias_ids))
+
+    @staticmethod
+    def expressao_busca(texto: str | None) -> str | None:
+        """
+        Converte o texto digitado em uma consulta FTS5 em que todas as palavras
+        precisam aparecer, cada uma como prefixo ("caf" encontra "café")
+        """
+        palavras = re.findall(r'\w+', texto or '')
+        if not palavras:
+            return None
+        return ' '.join(f'"{palavra}"*' for palavra in palavras)
+
+    @classmethod
+    def filtro_busca(cls, expressao: str):
+        """Condição "o nome corresponde à busca", sem ordenar por relevância"""
+        return cls.id.in_(
+            sa.select(produtos_fts.c.produto_id).
+            where(sa.literal_column('produtos_fts').op('MATCH')(expressao))
+        )
+
+    @classmethod
+    def ordenar_por_relevancia(cls, sentenca, expressao: str):
+        """Restringe a sentença aos produtos encontrados, dos mais relevantes aos menos"""
+        return (sentenca.
+                join(produtos_fts, produtos_fts.c.produto_id == cls.id).
+                where(sa.literal_column('produtos_fts').op('MATCH')(expressao)).
+                order_by(None).
+                order_by(produtos_fts.c.rank, cls.nome, cls.id))
+
+    def definir_foto(self, foto) -> None:
+        """
+        Associa ao produto uma foto já preparada por app.imagens.ingestao
+        (FotoIngerida), gravando-a no repositório de fotos, ou remove a foto
+        atual se ``foto`` for None
+        """
+        self.foto_base64 = None
+        if foto is None:
+            self.possui_foto = False
+            self.foto_mime = None
+            self.foto_hash = None
+            self.foto_tamanho_original = None
+            self.foto_tamanho = None
+        else:
+            self.possui_foto = True
+            self.foto_mime = foto.mime
+            self.foto_hash = fotos.put(foto.conteudo)
+            self.foto_tamanho_original = foto.tamanho_original
+            self.foto_tamanho = foto.tamanho
+
+    @classmethod
+    def movimentar_estoque(cls, produto_id: uuid.UUID, quantidade: int) -> int | None:
+        """
+        Soma ``quantidade`` (negativa para saídas) ao estoque com um único UPDATE
+        condicional, que só é aplicado se o estoque não ficar negativo. Como a
+        conta é feita pelo banco, movimentos concorrentes não se sobrescrevem.
+        Devolve o novo estoque, ou None se o movimento foi rejeitado (produto
+        inexistente ou estoque insuficiente)
+        """
+        return db.session.execute(
+            sa.update(cls).
+            where(cls.id == produto_id, cls.estoque + quantidade >= 0).
+            values(estoque=cls.estoque + quantidade).
+            returning(cls.estoque).
+            execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+
+    def definir_categorias(self, categorias_ids) -> None:
+        """
+        Associa o produto exatamente às categorias informadas, alterando só o
+        que mudou: as associações removidas são apagadas, as novas são
+        incluídas e as categorias que faltam são buscadas numa única consulta
+        """
+        from app.models.categoria import Categoria  # evita importação circular
+        desejadas = set(converter_uuids(categorias_ids))
+        atuais = {categoria.id: categoria for categoria in self.categorias}
+
+        for categoria_id in atuais.keys() - desejadas:
+            self.categorias.remove(atuais[categoria_id])
+        novas = desejadas - atuais.keys()
+        if novas:
+            self.categorias.extend(db.session.execute(
+                sa.select(Categoria).where(Categoria.id.in_(novas))
+            ).scalars())
+
+    @staticmethod
+    def versao_da_foto(foto_hash: str | None, dta_atualizacao) -> str:
+        """
+        Identificador da versão da foto, usado como ETag e no parâmetro ``v`` das
+        URLs das imagens. Fotos do repositório são identificadas pelo próprio
+        hash, de modo que alterações no produto que não mexem na foto (estoque,
+        preço) não invalidam os caches; sem hash (sem foto ou no formato
+        legado), pela data de atualização do produto
+        """
+        if foto_hash:
+            return foto_hash[:16]
+        # O SQLite grava CURRENT_TIMESTAMP em UTC, sem fuso
+        carimbo = (0 if dta_atualizacao is None
+                   else int(dta_atualizacao.replace(tzinfo=timezone.utc).timestamp()))
+        return f"sem-hash-{carimbo:x}"
 
-            # Calcular posição centralizada do texto
-            bbox = draw.textbbox((0, 0), texto, font=fonte)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            posicao = ((480 - text_width) / 2, (480 - text_height) / 2)
+    @property
+    def versao_foto(self) -> str:
+        return self.versao_da_foto(self.foto_hash, self.dta_atualizacao)
 
-            # Desenhar o texto em branco
-            draw.text(posicao, texto, fill=(255, 255, 255), font=fonte)
+    @property
+    def foto_conteudo(self) -> bytes | None:
+        """Bytes da foto, do repositório de fotos ou do formato legado em base64"""
+        if not self.possui_foto:
+            return None
+        if self.foto_base64 is not None:
+            return b64decode(self.foto_base64)
+        return fotos.get(self.foto_hash)
 
-            formato = "PNG"
-            entrada.save(saida, format=formato)
-            conteudo = saida.getvalue()
+    @property
+    def imagem(self):
+        if not self.possui_foto:
+            conteudo = imagem_sem_foto()
             tipo = 'image/png'
         else:
-            conteudo = b64decode(self.foto_base64)
+            conteudo = self.foto_conteudo
             tipo = self.foto_mime
         return conteudo, tipo
 
-
     def thumbnail(self, size: int = 128):
         if not self.possui_foto:
-            from PIL import ImageDraw, ImageFont
-
-            saida = io.BytesIO()
-            entrada = Image.new('RGB', (size, size), (128, 128, 128))
-
-            # Adicionar texto "Produto sem foto"
-            draw = ImageDraw.Draw(entrada)
-            texto = "Produto\nsem foto"
-
-            # Tentar usar fonte padrão, ou fallback para fonte básica
-            try:
-                # Ajustar tamanho da fonte baseado no tamanho da thumbnail
-                tamanho_fonte = max(10, int(size / 8))
-                fonte = ImageFont.truetype("arial.ttf", tamanho_fonte)
-            except:
-                fonte = ImageFont.load_default()
-
-            # Calcular posição centralizada do texto
-            bbox = draw.textbbox((0, 0), texto, font=fonte, align='center')
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            posicao = ((size - text_width) / 2, (size - text_height) / 2)
-
-            # Desenhar o texto em branco
-            draw.text(posicao, texto, fill=(255, 255, 255), font=fonte, align='center')
-
-            formato = "PNG"
-            entrada.save(saida, format=formato)
-            conteudo = saida.getvalue()
+            conteudo = thumbnail_sem_foto(size)
             tipo = 'image/png'
         else:
-            arquivo = io.BytesIO(b64decode(self.foto_base64))
-            saida = io.BytesIO()
-            entrada = Image.open(arquivo)
-            formato = entrada.format
-            (largura, altura) = entrada.size
-            fator = min(size/largura, size/altura)
-            novo_tamanho = (int(largura * fator), int(altura * fator))
-            entrada.thumbnail(novo_tamanho)
-            entrada.save(saida, format=formato)
-            conteudo = saida.getvalue()
+            conteudo = gerar_thumbnail(self.foto_conteudo, size)
             tipo = self.foto_mime
         return conteudo, tipo
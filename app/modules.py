@@ -3,6 +3,12 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_wtf import CSRFProtect
 from sqlalchemy.orm import DeclarativeBase
 
+from app.cache.categorias import CategoriaCache
+from app.cache.thumbnails import ThumbnailCache
+from app.imagens.derivados import GeradorDerivados
+from app.instrumentacao import Instrumentacao
+from app.storage.fotos import FotoStorage
+
 
 class Base(DeclarativeBase):
     # Se houver atributos comuns a todas as classes,
@@ -14,3 +20,8 @@ bootstrap = Bootstrap5()
 db = SQLAlchemy(model_class=Base,
                 disable_autonaming=True)
 csrf = CSRFProtect()
+thumbnail_cache = ThumbnailCache()
+categoria_cache = CategoriaCache()
+fotos = FotoStorage()
+derivados = GeradorDerivados()
+instrumentacao = Instrumentacao()
@@ -0,0 +1,179 @@
+import threading
+import time
+from collections import OrderedDict
+
+import sqlalchemy as sa
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+
+from app.modules import db
+
+# Contagens guardadas pelo modo de total "cache": chave -> (expira_em, total),
+# da menos para a mais recentemente usada (LRU, até PRODUTO_LISTA_TOTAL_CACHE_MAX)
+_contagens: OrderedDict[str, tuple[float, int]] = OrderedDict()
+_contagens_lock = threading.Lock()
+
+
+def _serializador() -> URLSafeSerializer:
+    return URLSafeSerializer(current_app.secret_key, salt='paginacao-keyset')
+
+
+def contar(sentenca, ttl: float | None = None) -> int:
+    """
+    Quantidade de linhas de uma sentença. Com ``ttl``, o resultado é
+    reaproveitado por até ``ttl`` segundos para a mesma sentença e parâmetros.
+    Como os parâmetros incluem a busca digitada, só as contagens usadas mais
+    recentemente são guardadas
+    """
+    contagem = sa.select(sa.func.count()).select_from(sentenca.order_by(None).subquery())
+    if ttl is None:
+        return db.session.execute(contagem).scalar_one()
+
+    compilada = contagem.compile()
+    chave = repr((str(compilada), sorted(compilada.params.items())))
+    agora = time.monotonic()
+    with _contagens_lock:
+        guardada = _contagens.get(chave)
+        if guardada and guardada[0] > agora:
+            _contagens.move_to_end(chave)
+            return guardada[1]
+    total = db.session.execute(contagem).scalar_one()
+    maximo = current_app.config.get('PRODUTO_LISTA_TOTAL_CACHE_MAX', 256)
+    with _contagens_lock:
+        _contagens[chave] = (agora + ttl, total)
+        _contagens.move_to_end(chave)
+        while len(_contagens) > maximo:
+            _contagens.popitem(last=False)
+    return total
+
+
+class KeysetPagination:
+    """
+    Paginação por chave (keyset), compatível com a interface de
+    ``db.paginate`` usada pelos templates (iteração, ``items``, ``total``,
+    ``has_prev``, ``has_next``).
+
+    Ao invés de OFFSET, cada página continua a partir da chave do último (ou
+    do primeiro) item da página anterior, de modo que o custo não cresce com
+    a profundidade. As posições são passadas em ``next_cursor`` e
+    ``prev_cursor``, tokens opacos e assinados.
+
+    ``total`` pode ser ``'exato'`` (COUNT a cada página), ``'cache'`` (COUNT
+    reaproveitado por ``ttl`` segundos) ou ``None`` (sem contagem). A
+    contagem usa ``contagem``, se informada, ou a própria ``sentenca``.
+
+    Com ``linhas``, os itens são as linhas (Row) da sentença, para consultas
+    de colunas avulsas, ao invés de entidades; as colunas da chave precisam
+    estar entre as selecionadas.
+    """
+
+    def __init__(self, sentenca, colunas, per_page: int, cursor: str | None = None,
+                 total: str | None = 'exato', ttl: float = 60, contagem=None,
+                 linhas: bool = False):
+        self.per_page = per_page
+        self.colunas = colunas
+
+        chave, direcao = self._decodificar(cursor) if cursor else (None, 'next')
+        anteriores = direcao == 'prev'
+
+        consulta = sentenca.order_by(None)
+        if chave is not None:
+            # A primeira comparação usa apenas a coluna principal, permitindo que
+            # o índice dela seja usado na busca; a segunda resolve os empates
+            principal, *_ = colunas
+            if anteriores:
+                consulta = consulta.where(principal <= chave[0],
+                                          sa.tuple_(*colunas) < sa.tuple_(*chave))
+            else:
+                consulta = consulta.where(principal >= chave[0],
+                                          sa.tuple_(*colunas) > sa.tuple_(*chave))
+        if anteriores:
+            consulta = consulta.order_by(*[c.desc() for c in colunas])
+        else:
+            consulta = consulta.order_by(*colunas)
+
+        resultado = db.session.execute(consulta.limit(per_page + 1))
+        itens = list(resultado.all() if linhas else resultado.unique().scalars())
+        mais = len(itens) > per_page
+        itens = itens[:per_page]
+        if anteriores:
+            itens.reverse()
+        self.items = itens
+
+        if anteriores:
+            self.has_prev = mais
+            self.has_next = True
+        else:
+            self.has_prev = chave is not None
+            self.has_next = mais
+        self.prev_cursor = self._codificar(itens[0], 'prev') if self.has_prev and itens else None
+        self.next_cursor = self._codificar(itens[-1], 'next') if self.has_next and itens else None
+
+        if contagem is None:
+            contagem = sentenca
+        if total == 'exato':
+            self.total = contar(contagem)
+        elif total == 'cache':
+            self.total = contar(contagem, ttl=ttl)
+        else:
+            self.total = None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def _codificar(self, item, direcao: str) -> str:
+        valores = [str(getattr(item, c.key)) for c in self.colunas]
+        return _serializador().dumps([valores, direcao])
+
+    def _decodificar(self, cursor: str):
+        try:
+            valores, direcao = _serializador().loads(cursor)
+        except (BadSignature, ValueError, TypeError):
+            raise ValueError("Cursor de paginação inválido")
+        chave = [c.type.python_type(v) for c, v in zip(self.colunas, valores)]
+        return chave, direcao
+
+
+class StreamingResults:
+    """
+    Todos os resultados de uma sentença, sem paginação, lidos do banco em
+    blocos de ``chunk`` linhas (``yield_per``) à medida que são iterados.
+    Serve para renderizar listagens completas com ``stream_template`` sem
+    manter todos os objetos na memória.
+
+    A interface imita ``db.paginate`` com uma única página. Como a contagem é
+    feita durante a iteração, ``total``, ``first`` e ``last`` só têm o valor
+    final depois que os itens foram percorridos.
+    """
+
+    def __init__(self, sentenca, chunk: int = 500):
+        self._sentenca = sentenca
+        self.chunk = chunk
+        self.total = 0
+        self.has_prev = False
+        self.has_next = False
+        self.page = 1
+        self.pages = 1
+
+    @property
+    def first(self) -> int:
+        return 1 if self.total else 0
+
+    @property
+    def last(self) -> int:
+        return self.total
+
+    @property
+    def per_page(self) -> int:
+        return self.total
+
+    def __iter__(self):
+        self.total = 0
+        resultado = db.session.execute(self._sentenca.execution_options(yield_per=self.chunk))
+        for item in resultado.scalars():
+            self.total += 1
+            yield item
+
+    def iter_pages(self, left_edge=2, left_current=2, right_current=5, right_edge=2):
+        # Retorna apenas a página 1 já que todos os itens estão em uma única página
+        return [1]
@@ -0,0 +1,258 @@
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+import sqlalchemy as sa
+from flask import Blueprint, current_app, jsonify, request
+
+from app.models.categoria import Categoria
+from app.models.juncoes import ProdutoCategoria
+from app.models.produto import Produto
+from app.modules import categoria_cache, db
+from app.paginacao import KeysetPagination
+
+bp = Blueprint('api', __name__, url_prefix='/api')
+
+# Campos que podem ser pedidos em "fields=" e as colunas correspondentes.
+# "categorias" e "total_produtos" vêm de consultas próprias
+CAMPOS_PRODUTO = {
+    'id': Produto.id,
+    'nome': Produto.nome,
+    'preco': Produto.preco,
+    'estoque': Produto.estoque,
+    'ativo': Produto.ativo,
+    'possui_foto': Produto.possui_foto,
+    'dta_cadastro': Produto.dta_cadastro,
+    'dta_atualizacao': Produto.dta_atualizacao,
+    'categorias': None,
+}
+CAMPOS_PRODUTO_PADRAO = ('id', 'nome', 'preco', 'estoque', 'ativo', 'categorias')
+CAMPOS_CATEGORIA = {
+    'id': Categoria.id,
+    'nome': Categoria.nome,
+    'total_produtos': None,
+}
+CAMPOS_CATEGORIA_PADRAO = ('id', 'nome', 'total_produtos')
+
+
+def _json(valor):
+    # Preços como texto, para não perder a precisão do DECIMAL
+    if isinstance(valor, (uuid.UUID, Decimal)):
+        return str(valor)
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return valor
+
+
+def _ler_campos(disponiveis: dict, padrao: tuple[str, ...]) -> list[str]:
+    """Campos pedidos em "fields=" (separados por vírgula), na ordem pedida"""
+    pedidos = request.args.get('fields')
+    if not pedidos:
+        return list(padrao)
+    campos = list(dict.fromkeys(c.strip() for c in pedidos.split(',') if c.strip()))
+    invalidos = [c for c in campos if c not in disponiveis]
+    if invalidos or not campos:
+        raise ValueError(f"Campos inválidos: {', '.join(invalidos)}. "
+                         f"Disponíveis: {', '.join(disponiveis)}")
+    return campos
+
+
+def _paginar(sentenca, colunas, contagem):
+    """Página (keyset) das linhas da sentença, conforme os parâmetros limit, cursor e total"""
+    limite = min(request.args.get('limit', type=int, default=50) or 50,
+                 current_app.config.get('API_LIMITE_MAXIMO', 500))
+    total = request.args.get('total')
+    return KeysetPagination(sentenca, colunas, max(limite, 1),
+                            cursor=request.args.get('cursor'),
+                            total=total if total in ('exato', 'cache') else None,
+                            ttl=current_app.config.get('PRODUTO_LISTA_TOTAL_TTL', 60),
+                            contagem=contagem, linhas=True)
+
+
+def _resposta_paginada(rset, itens: list[dict]):
+    return jsonify({'itens': itens,
+                    'anterior': rset.prev_cursor,
+                    'proximo': rset.next_cursor,
+                    'total': rset.total})
+
+
+def _categorias_dos_produtos(produtos_ids) -> dict:
+    """Categorias (id e nome) de cada produto da página, numa única consulta"""
+    categorias = defaultdict(list)
+    if not produtos_ids:
+        return categorias
+    linhas = db.session.execute(
+        sa.select(ProdutoCategoria.produto_id, Categoria.id, Categoria.nome).
+        join(Categoria, Categoria.id == ProdutoCategoria.categoria_id).
+        where(ProdutoCategoria.produto_id.in_(produtos_ids)).
+        order_by(Categoria.nome)
+    )
+    for produto_id, categoria_id, nome in linhas:
+        categorias[produto_id].append({'id': str(categoria_id), 'nome': nome})
+    return categorias
+
+
+@bp.route('/produtos', methods=['GET'])
+def produtos():
+    """
+    Produtos, em ordem de nome, paginados por chave. Parâmetros: "fields",
+    "cat" (pode repetir; mesmo filtro da listagem de produtos), "q" (busca
+    pelo nome), "limit", "cursor" e "total" ("exato" ou "cache")
+    """
+    try:
+        campos = _ler_campos(CAMPOS_PRODUTO, CAMPOS_PRODUTO_PADRAO)
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+
+    # Só as colunas pedidas são selecionadas, além da chave da paginação
+    colunas = [Produto.nome, Produto.id] + [CAMPOS_PRODUTO[c] for c in campos
+                                            if c not in ('id', 'nome', 'categorias')]
+    sentenca = sa.select(*colunas)
+    contagem = sa.select(Produto.id)
+
+    snapshot = categoria_cache.snapshot()
+    selecionadas = snapshot.ids.intersection(request.args.getlist('cat'))
+    if selecionadas and selecionadas != snapshot.ids:
+        categorias_uuid = [uuid.UUID(c) for c in selecionadas]
+        sentenca = sentenca.where(Produto.filtro_categorias(categorias_uuid))
+        contagem = contagem.where(Produto.filtro_categorias(categorias_uuid, para_contagem=True))
+
+    expressao = Produto.expressao_busca(request.args.get('q', default='').strip())
+    if expressao:
+        sentenca = sentenca.where(Produto.filtro_busca(expressao))
+        contagem = contagem.where(Produto.filtro_busca(expressao))
+
+    try:
+        rset = _paginar(sentenca, (Produto.nome, Produto.id), contagem)
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+
+    colunas_saida = [c for c in campos if c != 'categorias']
+    itens = [{c: _json(linha._mapping[c]) for c in colunas_saida} for linha in rset.items]
+    if 'categorias' in campos:
+        por_produto = _categorias_dos_produtos([linha.id for linha in rset.items])
+        for item, linha in zip(itens, rset.items):
+            item['categorias'] = por_produto.get(linha.id, [])
+    return _resposta_paginada(rset, itens)
+
+
+@bp.route('/categorias', methods=['GET'])
+def categorias():
+    """
+    Categorias, em ordem de nome, paginadas por chave. Parâmetros: "fields"
+    (id, nome, total_produtos), "limit", "cursor" e "total"
+    """
+    try:
+        campos = _ler_campos(CAMPOS_CATEGORIA, CAMPOS_CATEGORIA_PADRAO)
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+
+    sentenca = sa.select(Categoria.nome, Categoria.id)
+    if 'total_produtos' in campos:
+        # Contagem na junção, como em Categoria.lista_com_contagem
+        sentenca = (sentenca.
+                    add_columns(sa.func.count(ProdutoCategoria.produto_id).label('total_produtos')).
+                    outerjoin(ProdutoCategoria, ProdutoCategoria.categoria_id == Categoria.id).
+                    group_by(Categoria.id, Categoria.nome))
+
+    try:
+        rset = _paginar(sentenca, (Categoria.nome, Categoria.id), sa.select(Categoria.id))
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+
+    itens = [{c: _json(linha._mapping[c]) for c in campos} for linha in rset.items]
+    return _resposta_paginada(rset, itens)
+
+
+def _ler_movimento(movimento) -> tuple[uuid.UUID, int]:
+    """Valida um movimento no formato {"produto": <uuid>, "quantidade": <inteiro>}"""
+    if not isinstance(movimento, dict):
+        raise ValueError("movimento inválido")
+    try:
+        produto_id = uuid.UUID(str(movimento.get('produto')))
+    except ValueError:
+        raise ValueError("produto inválido") from None
+    quantidade = movimento.get('quantidade')
+    if not isinstance(quantidade, int) or isinstance(quantidade, bool):
+        raise ValueError("a quantidade deve ser um número inteiro")
+    # Limita a quantidade para que a conta no banco não saia da faixa dos
+    # inteiros de 64 bits do SQLite
+    maxima = current_app.config.get('API_ESTOQUE_QUANTIDADE_MAXIMA', 1_000_000)
+    if abs(quantidade) > maxima:
+        raise ValueError(f"a quantidade deve estar entre -{maxima} e {maxima}")
+    return produto_id, quantidade
+
+
+def _aplicar_movimentos(movimentos: list) -> tuple[list[dict], list[dict]]:
+    """
+    Aplica os movimentos, em ordem, na transação atual. Devolve os aplicados
+    (com o novo estoque) e os rejeitados (com o motivo)
+    """
+    aplicados, rejeitados = [], []
+    for indice, movimento in enumerate(movimentos):
+        try:
+            produto_id, quantidade = _ler_movimento(movimento)
+        except ValueError as e:
+            rejeitados.append({'indice': indice, 'motivo': str(e)})
+            continue
+        estoque = Produto.movimentar_estoque(produto_id, quantidade)
+        if estoque is None:
+            rejeitados.append({'indice': indice, 'produto': produto_id})
+        else:
+            aplicados.append({'indice': indice, 'produto': str(produto_id), 'estoque': estoque})
+
+    # O UPDATE não diz por que não alterou a linha: uma consulta só para
+    # separar os produtos inexistentes dos sem estoque suficiente
+    sem_motivo = [r for r in rejeitados if 'motivo' not in r]
+    if sem_motivo:
+        existentes = set(db.session.execute(
+            db.select(Produto.id).where(Produto.id.in_({r['produto'] for r in sem_motivo}))
+        ).scalars())
+        for rejeitado in sem_motivo:
+            rejeitado['motivo'] = ("estoque insuficiente" if rejeitado['produto'] in existentes
+                                   else "produto inexistente")
+            rejeitado['produto'] = str(rejeitado['produto'])
+    return aplicados, rejeitados
+
+
+@bp.route('/estoque/movimentos', methods=['POST'])
+def movimentar_estoque():
+    """
+    Movimentos de estoque em lote, numa única transação:
+
+        {"movimentos": [{"produto": "<uuid>", "quantidade": -2}, ...], "atomico": false}
+
+    Com "atomico", qualquer rejeição desfaz todo o lote (409)
+    """
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict) or not isinstance(dados.get('movimentos'), list):
+        return jsonify({'erro': "Envie um objeto com a lista \"movimentos\""}), 400
+    movimentos = dados['movimentos']
+    limite = current_app.config.get('API_ESTOQUE_LOTE_MAXIMO', 1000)
+    if len(movimentos) > limite:
+        return jsonify({'erro': f"No máximo {limite} movimentos por lote"}), 413
+
+    aplicados, rejeitados = _aplicar_movimentos(movimentos)
+    if rejeitados and dados.get('atomico', False):
+        db.session.rollback()
+        return jsonify({'aplicados': [], 'rejeitados': rejeitados}), 409
+    db.session.commit()
+    return jsonify({'aplicados': aplicados, 'rejeitados': rejeitados})
+
+
+@bp.route('/produtos/<uuid:produto_id>/estoque', methods=['POST'])
+def movimentar_estoque_produto(produto_id):
+    """Um movimento de estoque: {"quantidade": <inteiro>}"""
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict):
+        return jsonify({'erro': "Envie um objeto com a \"quantidade\""}), 400
+
+    aplicados, rejeitados = _aplicar_movimentos([{**dados, 'produto': str(produto_id)}])
+    if rejeitados:
+        db.session.rollback()
+        motivo = rejeitados[0]['motivo']
+        status = {'produto inexistente': 404, 'estoque insuficiente': 409}.get(motivo, 400)
+        return jsonify({'produto': str(produto_id), 'erro': motivo}), status
+    db.session.commit()
+    return jsonify({'produto': str(produto_id), 'estoque': aplicados[0]['estoque']})
@@ -1,5 +1,4 @@
-import sqlalchemy as sa
-from flask import Blueprint, flash, redirect, render_template, request, url_for
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
 
 from app.forms.categoria import EditCategoriaForm, NovoCategoriaForm
 from app.models.categoria import Categoria
@@ -10,9 +9,7 @@ bp = Blueprint('categoria', __name__, url_prefix='/categoria')
 
 @bp.route('/', methods=['GET'])
 def lista():
-    sentenca = sa.select(Categoria).order_by(Categoria.nome)
-    rset = db.session.execute(sentenca).scalars()
-
+    rset = Categoria.lista_com_contagem()
     return render_template('categoria/lista.jinja2',
                            rset=rset)
 
@@ -47,18 +44,14 @@ def edit(id_categoria):
         flash("Categoria alterada", category='success')
         return redirect(url_for('categoria.lista'))
 
-    # Get 5 random products with this category
-    import random
-    random_produtos = random.sample(categoria.lista_de_produtos,
-                                    min(5,
-                                        len(categoria.lista_de_produtos))) if \
-        categoria.lista_de_produtos else []
+    # Obter 5 produtos aleatórios desta categoria
+    random_produtos, total_produtos = categoria.amostra_produtos(5)
 
     return render_template('categoria/add_edit.jinja2',
                            title="Alterar categoria",
                            form=form,
                            categoria=categoria,
-                           total_produtos=len(categoria.lista_de_produtos),
+                           total_produtos=total_produtos,
                            random_produtos=random_produtos)
 
 
@@ -69,20 +62,19 @@ def remove(id_categoria):
         flash("Categoria inexistente", category='warning')
         return redirect(url_for('categoria.lista'))
 
-    # Check if any product would be left without categories
-    produtos_com_unica_categoria = []
-    for produto in categoria.lista_de_produtos:
-        if len(produto.categorias) == 1:
-            produtos_com_unica_categoria.append(produto.nome)
-
-    if produtos_com_unica_categoria:
+    # Verificar se algum produto ficaria sem categoria
+    limite = current_app.config.get('CATEGORIA_REMOCAO_MAX_NOMES', 10)
+    produtos_com_unica_categoria, total = categoria.produtos_exclusivos(limite=limite)
+    if total:
+        restantes = total - len(produtos_com_unica_categoria)
+        complemento = f" e mais {restantes} produto(s)" if restantes else ""
         flash(
             f"Não é possível remover esta categoria. Os seguintes produtos ficariam sem "
-            f"categoria: {', '.join(produtos_com_unica_categoria)}",
+            f"categoria: {', '.join(produtos_com_unica_categoria)}{complemento}",
             category='danger')
         return redirect(url_for('categoria.lista'))
 
-    db.session.delete(categoria)
+    categoria.remover()
     db.session.commit()
     flash("Categoria removida", category='success')
     return redirect(url_for('categoria.lista'))
@@ -1,49 +1,51 @@
-from base64 import b64encode
+from datetime import timezone
 
-from flask import abort, Blueprint, flash, redirect, render_template, request, Response, url_for
+from flask import (abort, Blueprint, current_app, flash, jsonify, redirect, render_template,
+                   request, Response, send_file, stream_template, stream_with_context, url_for)
+from sqlalchemy.orm import selectinload, undefer_group
 from werkzeug.exceptions import NotFound
+from werkzeug.http import is_resource_modified
 
+from app.exportacao import FORMATOS, gerar, sentenca_catalogo
 from app.forms.produto import ProdutoForm
-from app.models.categoria import Categoria
+from app.imagens.ingestao import FotoInvalida, ingerir
+from app.imagens.placeholder import imagem_sem_foto, thumbnail_sem_foto
 from app.models.produto import Produto
-from app.modules import db
+from app.modules import categoria_cache, db, derivados, fotos, thumbnail_cache
+from app.paginacao import contar, KeysetPagination, StreamingResults
+from app.utils import converter_uuids
 
 bp = Blueprint('produto', __name__, url_prefix="/produto")
 
 
 @bp.route('/add', methods=['GET', 'POST'])
 def add():
-    if Categoria.is_empty():
+    categorias = categoria_cache.snapshot()
+    if categorias.vazio:
         flash("Impossível adicionar produto. Adcione pelo menos uma categoria",
               category='warning')
         return redirect(url_for('categoria.add'))
 
     form = ProdutoForm()
     form.submit.label.text = "Adicionar produto"
-    categorias = db.session.execute(db.select(Categoria).order_by(Categoria.nome)).scalars()
-    form.categorias.choices = [(str(i.id), i.nome) for i in categorias]
+    form.categorias.choices = list(categorias.itens)
     if form.validate_on_submit():
+        try:
+            foto = ingerir(request.files[form.foto.name].stream) if form.foto.data else None
+        except FotoInvalida as e:
+            form.foto.errors.append(str(e))
+            return render_template('produto/add.jinja2', form=form,
+                                   title="Adicionar novo produto")
+
         produto = Produto(nome=form.nome.data, preco=form.preco.data,
                           ativo=form.ativo.data, estoque=form.estoque.data)
-        if form.foto.data:
-            produto.possui_foto = True
-            produto.foto_base64 = (b64encode(request.files[form.foto.name].read()).
-                                   decode('ascii'))
-            produto.foto_mime = request.files[form.foto.name].mimetype
-        else:
-            produto.possui_foto = False
-            produto.foto_base64 = None
-            produto.foto_mime = None
-
+        produto.definir_foto(foto)
         db.session.add(produto)
-
-        # Add selected categories to the product
-        for categoria_id in form.categorias.data:
-            categoria = Categoria.get_by_id(categoria_id)
-            if categoria:
-                produto.categorias.append(categoria)
+        produto.definir_categorias(form.categorias.data)
 
         db.session.commit()
+        if foto is not None:
+            derivados.agendar(produto.id, produto.foto_hash, foto.conteudo)
         flash("Produto adicionado!")
         return redirect(url_for('produto.lista'))
 
@@ -60,32 +62,33 @@ def edit(produto_id):
 
     form = ProdutoForm(obj=produto)
     form.submit.label.text = "Alterar produto"
-    categorias = db.session.execute(db.select(Categoria).order_by(Categoria.nome)).scalars()
-    form.categorias.choices = [(str(i.id), i.nome) for i in categorias]
+    form.categorias.choices = list(categoria_cache.snapshot().itens)
     if form.validate_on_submit():
+        foto = None
+        if form.foto.data and not form.removerfoto.data:
+            try:
+                foto = ingerir(request.files[form.foto.name].stream)
+            except FotoInvalida as e:
+                form.foto.errors.append(str(e))
+                return render_template('produto/edit.jinja2', form=form,
+                                       title="Alterar um produto",
+                                       produto=produto)
+
         produto.nome = form.nome.data
         produto.preco = form.preco.data
         produto.estoque = form.estoque.data
         produto.ativo = form.ativo.data
 
-        if form.removerfoto.data:
-            produto.possui_foto = False
-            produto.foto_mime = None
-            produto.foto_base64 = None
-        elif form.foto.data:
-            produto.possui_foto = True
-            produto.foto_base64 = (b64encode(request.files[form.foto.name].read()).
-                                   decode('ascii'))
-            produto.foto_mime = request.files[form.foto.name].mimetype
-
-        # Update categories
-        produto.categorias.clear()
-        for categoria_id in form.categorias.data:
-            categoria = Categoria.get_by_id(categoria_id)
-            if categoria:
-                produto.categorias.append(categoria)
+        if form.removerfoto.data or foto is not None:
+            produto.definir_foto(foto)
+            thumbnail_cache.invalidate(produto.id)
+            derivados.descartar(produto.id)
+
+        produto.definir_categorias(form.categorias.data)
 
         db.session.commit()
+        if foto is not None:
+            derivados.agendar(produto.id, produto.foto_hash, foto.conteudo)
         flash("Produto alterado", category='success')
         return redirect(url_for('produto.lista'))
 
@@ -105,6 +108,8 @@ def delete(produto_id):
 
     db.session.delete(produto)
     db.session.commit()
+    thumbnail_cache.invalidate(produto_id)
+    derivados.descartar(produto_id)
     flash("Produto removido!", category='success')
     return redirect(url_for('produto.lista'))
 
@@ -112,10 +117,10 @@ def delete(produto_id):
 @bp.route('/lista', methods=['GET', 'POST'])
 @bp.route('/', methods=['GET', 'POST'])
 def lista():
-    import uuid
     from flask import session
 
     page = request.args.get('page', type=int, default=1)
+    busca = request.args.get('q', default='').strip()
 
     # Obter tamanho da página (pp = per page)
     pp_param = request.args.get('pp', default='25')
@@ -128,103 +133,225 @@ def lista():
             pp = 25
 
     # Obter todas as categorias para o filtro
-    todas_categorias = db.session.execute(
-        db.select(Categoria).order_by(Categoria.nome)).scalars().all()
+    categorias = categoria_cache.snapshot()
+    todas_categorias = categorias.itens
 
-    # Obter IDs das categorias selecionadas do POST ou da sessão
+    # Obter IDs das categorias selecionadas do POST ou da sessão. Na sessão
+    # (cookie) fica só um mapa de bits das categorias (ver
+    # SnapshotCategorias.codificar); sem seleção, ou com todas, nada é guardado
     if request.method == 'POST':
-        categorias_selecionadas = request.form.getlist('cat')
-        # Salvar na sessão para usar na paginação
-        session['categorias_filtro'] = categorias_selecionadas
+        categorias_selecionadas = categorias.ids.intersection(request.form.getlist('cat'))
+        if categorias_selecionadas and categorias_selecionadas != categorias.ids:
+            session['categorias_filtro'] = categorias.codificar(categorias_selecionadas)
+        else:
+            categorias_selecionadas = categorias.ids
+            session.pop('categorias_filtro', None)
     else:
-        # Recuperar da sessão ou usar todas por padrão
-        categorias_selecionadas = session.get('categorias_filtro',
-                                              [str(c.id) for c in todas_categorias])
-
-    # Se nenhuma categoria foi selecionada, selecionar todas por padrão
-    if not categorias_selecionadas:
-        categorias_selecionadas = [str(c.id) for c in todas_categorias]
+        categorias_selecionadas = categorias.decodificar(session.get('categorias_filtro'))
 
-    # Construir query com filtro de categoria
-    from app.models.juncoes import ProdutoCategoria
+    # Construir query com filtro de categoria. A contagem usa uma sentença
+    # própria, com a forma do filtro mais adequada quando a ordem não importa
     sentenca = db.select(Produto).order_by(Produto.nome)
+    contagem = db.select(Produto.id)
 
     # Só aplicar filtro se nem todas as categorias estão selecionadas
-    todas_cat_ids = set(str(c.id) for c in todas_categorias)
-    cat_selecionadas_set = set(categorias_selecionadas)
-
-    if cat_selecionadas_set and cat_selecionadas_set != todas_cat_ids:
-        # Converter strings para UUIDs
-        categorias_uuid = []
-        for cat_id in categorias_selecionadas:
-            try:
-                categorias_uuid.append(uuid.UUID(cat_id))
-            except (ValueError, AttributeError):
-                continue
-
-        # Filtrar produtos que têm pelo menos uma das categorias selecionadas
-        if categorias_uuid:
-            sentenca = sentenca.join(ProdutoCategoria).filter(
-                    ProdutoCategoria.categoria_id.in_(categorias_uuid)
-            ).distinct()
+    if categorias_selecionadas != categorias.ids:
+        categorias_uuid = converter_uuids(categorias_selecionadas)
+        sentenca = sentenca.where(Produto.filtro_categorias(categorias_uuid))
+        contagem = contagem.where(Produto.filtro_categorias(categorias_uuid,
+                                                            para_contagem=True))
+
+    # Busca textual pelo nome. Na paginação por chave a ordem precisa ser
+    # (nome, id), então a relevância só é usada nos demais modos
+    expressao = Produto.expressao_busca(busca)
+    keyset = current_app.config.get('PRODUTO_LISTA_PAGINACAO', 'offset') == 'keyset'
+    if expressao:
+        if keyset and pp != 'all':
+            sentenca = sentenca.where(Produto.filtro_busca(expressao))
+        else:
+            sentenca = Produto.ordenar_por_relevancia(sentenca, expressao)
+        contagem = contagem.where(Produto.filtro_busca(expressao))
 
     # Paginar ou obter todos os resultados
     if pp == 'all':
-        # Obter todos os resultados sem paginação
-        produtos = db.session.execute(sentenca).scalars().all()
-
-        # Criar um objeto que simula paginação para manter compatibilidade com o template
-        class AllResults:
-            def __init__(self, items):
-                self.items = items
-                self.total = len(items)
-                self.first = 1 if items else 0
-                self.last = len(items)
-                self.has_prev = False
-                self.has_next = False
-                self.page = 1
-                self.pages = 1
-                self.per_page = len(items)
-
-            def __iter__(self):
-                return iter(self.items)
-
-            def iter_pages(self, left_edge=2, left_current=2, right_current=5, right_edge=2):
-                # Retorna apenas a página 1 já que todos os itens estão em uma única página
-                return [1]
-
-        rset = AllResults(produtos)
+        # Todos os resultados, lidos em blocos enquanto a página é enviada. O
+        # selectinload carrega as categorias de cada bloco (o joinedload não
+        # funciona com yield_per)
+        sentenca = sentenca.options(selectinload(Produto.categorias))
+        rset = StreamingResults(sentenca,
+                                chunk=current_app.config.get('PRODUTO_LISTA_STREAM_CHUNK', 500))
+        return stream_template('produto/lista.jinja2',
+                               title="Lista de produtos",
+                               rset=rset,
+                               page=page,
+                               pp=pp,
+                               busca=busca,
+                               todas_categorias=todas_categorias,
+                               categorias_selecionadas=categorias_selecionadas)
+
+    sentenca = sentenca.options(Produto.carregar_categorias())
+    if keyset:
+        # Paginação por chave (nome, id): o custo não cresce com a profundidade
+        total = current_app.config.get('PRODUTO_LISTA_TOTAL', 'exato')
+        ttl = current_app.config.get('PRODUTO_LISTA_TOTAL_TTL', 60)
+        try:
+            rset = KeysetPagination(sentenca, (Produto.nome, Produto.id), pp,
+                                    cursor=request.args.get('cursor'),
+                                    total=total, ttl=ttl, contagem=contagem)
+        except ValueError:
+            flash("Posição de paginação inválida. Apresentando a primeira página")
+            rset = KeysetPagination(sentenca, (Produto.nome, Produto.id), pp,
+                                    total=total, ttl=ttl, contagem=contagem)
     else:
         try:
-            rset = db.paginate(sentenca, page=page, per_page=pp, error_out=True)
+            rset = db.paginate(sentenca, page=page, per_page=pp, error_out=True,
+                               count=False)
         except NotFound:
             flash(f"Não temos produtos na página {page}. Apresentando página 1")
             page = 1
-            rset = db.paginate(sentenca, page=page, per_page=pp, error_out=False)
+            rset = db.paginate(sentenca, page=page, per_page=pp, error_out=False,
+                               count=False)
+        rset.total = contar(contagem)
 
     return render_template('produto/lista.jinja2',
                            title="Lista de produtos",
                            rset=rset,
                            page=page,
                            pp=pp,
+                           busca=busca,
                            todas_categorias=todas_categorias,
                            categorias_selecionadas=categorias_selecionadas)
 
 
+@bp.route('/exportar/<formato>', methods=['GET'])
+def exportar(formato):
+    # Mesmo filtro da listagem: sem categorias (parâmetro "cat"), todos os produtos
+    if formato not in FORMATOS:
+        return abort(404)
+    sentenca = sentenca_catalogo(converter_uuids(request.args.getlist('cat')), formato)
+    linhas = gerar(formato, sentenca, current_app.config.get('EXPORTACAO_CHUNK', 1000))
+    return Response(stream_with_context(linhas),
+                    mimetype=FORMATOS[formato],
+                    headers={'Content-Disposition': f'attachment; filename=produtos.{formato}'})
+
+
+def _validadores_da_foto(id_produto):
+    """
+    Busca apenas as colunas necessárias para responder a uma requisição
+    condicional, sem carregar a foto. Devolve a ETag e a data de modificação
+    """
+    linha = db.session.execute(
+        db.select(Produto.foto_hash, Produto.dta_atualizacao).
+        where(Produto.id == id_produto)
+    ).one_or_none()
+    if linha is None:
+        return abort(404)
+    modificado = linha.dta_atualizacao
+    if modificado is not None:
+        # O SQLite grava CURRENT_TIMESTAMP em UTC, sem fuso
+        modificado = modificado.replace(tzinfo=timezone.utc)
+    return Produto.versao_da_foto(linha.foto_hash, linha.dta_atualizacao), modificado
+
+
+def _preparar_resposta_da_foto(resposta: Response, etag: str, modificado) -> Response:
+    resposta.set_etag(etag)
+    resposta.last_modified = modificado
+    resposta.cache_control.public = True
+    if request.args.get('v') == etag:
+        # URL versionada: o conteúdo nunca muda para esta URL
+        resposta.cache_control.max_age = current_app.config.get('FOTO_MAX_AGE',
+                                                                365 * 24 * 60 * 60)
+        resposta.cache_control.immutable = True
+        resposta.cache_control.no_cache = None
+    else:
+        resposta.cache_control.no_cache = True
+    return resposta
+
+
+def _nao_modificada(etag: str, modificado) -> bool:
+    return not is_resource_modified(request.environ, etag=etag, last_modified=modificado)
+
+
 @bp.route('/imagem/<uuid:id_produto>', methods=['GET'])
 def imagem(id_produto):
-    produto = Produto.get_by_id(id_produto)
+    etag, modificado = _validadores_da_foto(id_produto)
+    if _nao_modificada(etag, modificado):
+        return _preparar_resposta_da_foto(Response(status=304), etag, modificado)
+
+    produto = Produto.get_by_id(id_produto, opcoes=[undefer_group('foto')])
     if produto is None:
         return abort(404)
-    conteudo, tipo = produto.imagem
-    return Response(conteudo, mimetype=tipo)
+    if produto.possui_foto and produto.foto_base64 is None:
+        # Os bytes vêm direto do repositório de fotos, sem decodificação
+        resposta = send_file(fotos.open(produto.foto_hash), mimetype=produto.foto_mime,
+                             etag=False)
+    else:
+        conteudo, tipo = produto.imagem
+        resposta = Response(conteudo, mimetype=tipo)
+    return _preparar_resposta_da_foto(resposta, etag, modificado)
 
 
 @bp.route('/thumbnail/<uuid:id_produto>/<int:size>', methods=['GET'])
 @bp.route('/thumbnail/<uuid:id_produto>', methods=['GET'])
 def thumbnail(id_produto, size=128):
-    produto = Produto.get_by_id(id_produto)
+    # Só os tamanhos padrão: tamanhos arbitrários gerariam uma imagem (e uma
+    # entrada no cache de miniaturas) por tamanho pedido
+    if size not in derivados.tamanhos:
+        return abort(404)
+    etag, modificado = _validadores_da_foto(id_produto)
+    if _nao_modificada(etag, modificado):
+        return _preparar_resposta_da_foto(Response(status=304), etag, modificado)
+
+    produto = Produto.get_by_id(id_produto, opcoes=[undefer_group('foto')])
+    if produto is None:
+        return abort(404)
+    if not produto.possui_foto:
+        conteudo, tipo = produto.thumbnail(size)
+    else:
+        tipo = produto.foto_mime
+        conteudo = thumbnail_cache.get(produto.id, produto.foto_hash, size)
+        if conteudo is None:
+            conteudo, _ = produto.thumbnail(size)
+            thumbnail_cache.put(produto.id, produto.foto_hash, size, conteudo)
+    return _preparar_resposta_da_foto(Response(conteudo, mimetype=tipo), etag, modificado)
+
+
+@bp.route('/thumbnail/status/<uuid:id_produto>', methods=['GET'])
+def thumbnail_status(id_produto):
+    produto = Produto.get_by_id(id_produto, campos=['possui_foto', 'foto_hash'])
     if produto is None:
         return abort(404)
-    conteudo, tipo = produto.thumbnail(size)
-    return Response(conteudo, mimetype=tipo)
+    if not produto.possui_foto:
+        return jsonify({'produto': str(produto.id), 'possui_foto': False})
+    return jsonify({
+        'produto': str(produto.id),
+        'possui_foto': True,
+        'foto_hash': produto.foto_hash,
+        'geracao': derivados.status(produto.id, produto.foto_hash),
+        'tamanhos': {size: thumbnail_cache.contains(produto.id, produto.foto_hash, size)
+                     for size in derivados.tamanhos},
+    })
+
+
+@bp.route('/thumbnail/cache', methods=['GET'])
+def thumbnail_cache_stats():
+    return jsonify(thumbnail_cache.stats())
+
+
+@bp.route('/sem-foto/<int:size>', methods=['GET'])
+@bp.route('/sem-foto', methods=['GET'])
+def sem_foto(size=None):
+    # Só os tamanhos pré-renderizados: cada tamanho novo seria uma imagem
+    # gerada (e memorizada) a pedido do cliente
+    if size is not None and size not in current_app.config.get('PLACEHOLDER_TAMANHOS',
+                                                               [64, 128, 256]):
+        return abort(404)
+    # Imagem comum a todos os produtos sem foto: pode ficar no cache do
+    # navegador por bastante tempo
+    conteudo = imagem_sem_foto() if size is None else thumbnail_sem_foto(size)
+    resposta = Response(conteudo, mimetype='image/png')
+    resposta.cache_control.public = True
+    resposta.cache_control.max_age = current_app.config.get('PLACEHOLDER_MAX_AGE',
+                                                            30 * 24 * 60 * 60)
+    resposta.add_etag()
+    return resposta.make_conditional(request)
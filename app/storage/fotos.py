@@ -0,0 +1,122 @@
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+from werkzeug.utils import import_string
+
+
+class FotoStore(ABC):
+    """
+    Interface dos repositórios de fotos. As fotos são endereçadas pelo hash
+    SHA-256 do conteúdo, de modo que uploads idênticos ocupam um único blob.
+    """
+
+    @staticmethod
+    def calcular_hash(conteudo: bytes) -> str:
+        return hashlib.sha256(conteudo).hexdigest()
+
+    @abstractmethod
+    def put(self, conteudo: bytes) -> str:
+        ...
+
+    def get(self, foto_hash: str) -> bytes:
+        with self.open(foto_hash) as arquivo:
+            return arquivo.read()
+
+    @abstractmethod
+    def open(self, foto_hash: str) -> BinaryIO:
+        ...
+
+    @abstractmethod
+    def exists(self, foto_hash: str) -> bool:
+        ...
+
+    @abstractmethod
+    def delete(self, foto_hash: str) -> None:
+        ...
+
+    @abstractmethod
+    def hashes(self) -> Iterator[str]:
+        ...
+
+
+class LocalFotoStore(FotoStore):
+    """
+    Repositório no sistema de arquivos local, em
+    ``<raiz>/<2 primeiros caracteres do hash>/<hash>``
+    """
+
+    def __init__(self, raiz: str | Path):
+        self.raiz = Path(raiz)
+        self.raiz.mkdir(parents=True, exist_ok=True)
+
+    def _caminho(self, foto_hash: str) -> Path:
+        if len(foto_hash) != 64 or not all(c in '0123456789abcdef' for c in foto_hash):
+            raise ValueError(f"Hash de foto inválido: '{foto_hash}'")
+        return self.raiz / foto_hash[:2] / foto_hash
+
+    def put(self, conteudo: bytes) -> str:
+        foto_hash = self.calcular_hash(conteudo)
+        caminho = self._caminho(foto_hash)
+        if caminho.is_file():
+            return foto_hash
+
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=caminho.parent, prefix='.tmp')
+        try:
+            with os.fdopen(descritor, 'wb') as saida:
+                saida.write(conteudo)
+            os.replace(temporario, caminho)
+        except OSError:
+            Path(temporario).unlink(missing_ok=True)
+            raise
+        return foto_hash
+
+    def open(self, foto_hash: str) -> BinaryIO:
+        return self._caminho(foto_hash).open('rb')
+
+    def exists(self, foto_hash: str) -> bool:
+        return self._caminho(foto_hash).is_file()
+
+    def delete(self, foto_hash: str) -> None:
+        self._caminho(foto_hash).unlink(missing_ok=True)
+
+    def hashes(self) -> Iterator[str]:
+        for pasta in self.raiz.iterdir():
+            if pasta.is_dir():
+                for arquivo in pasta.iterdir():
+                    if not arquivo.name.startswith('.'):
+                        yield arquivo.name
+
+
+class FotoStorage:
+    """
+    Extensão que escolhe o repositório de fotos a partir da configuração
+    ``FOTO_STORE``: ``local`` (padrão) ou o caminho de importação de uma
+    subclasse de :class:`FotoStore` (por exemplo ``pacote.modulo:MinhaClasse``),
+    que recebe a aplicação no construtor.
+    """
+    backends = {
+        'local': lambda app: LocalFotoStore(
+                Path(app.instance_path) / app.config.get('FOTO_STORE_PATH', 'fotos')),
+    }
+
+    def __init__(self, app=None):
+        self.backend: FotoStore | None = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        nome = app.config.get('FOTO_STORE', 'local')
+        fabrica = self.backends.get(nome) or import_string(nome)
+        self.backend = fabrica(app)
+        app.extensions['foto_storage'] = self
+
+    def __getattr__(self, atributo):
+        # Delegar put/get/open/exists/delete/hashes para o repositório ativo
+        if atributo == 'backend':
+            raise AttributeError(atributo)
+        return getattr(self.backend, atributo)
@@ -1,4 +1,5 @@
 import datetime
+import uuid
 from pathlib import Path
 
 import pytz
@@ -23,6 +24,80 @@ def existe_esquema(app) -> bool:
     #   target_metadata = Base.metada
 
 
+# Perfil padrão da conexão com o SQLite. O WAL permite que as leituras
+# continuem enquanto há uma escrita em andamento, e o busy_timeout faz as
+# escritas concorrentes esperarem ao invés de falhar com "database is locked"
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -65536,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
+SQLITE_ENGINE_OPTIONS = {
+    'pool_size': 10,
+    'max_overflow': 20,
+    'pool_timeout': 30,
+    'pool_recycle': 3600,
+}
+
+
+def configurar_engine(app) -> None:
+    """
+    Completa SQLALCHEMY_ENGINE_OPTIONS com a configuração padrão do pool.
+    Precisa ser chamada antes de db.init_app()
+    """
+    if not app.config.get('SQLALCHEMY_DATABASE_URI', '').startswith('sqlite'):
+        return
+    opcoes = dict(SQLITE_ENGINE_OPTIONS)
+    opcoes.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opcoes
+
+
+def configurar_sqlite(app, engine) -> None:
+    """
+    Aplica os PRAGMAs (os padrões de SQLITE_PRAGMAS, sobrepostos pela
+    configuração de mesmo nome) a cada nova conexão do engine e registra no
+    log os valores efetivos
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    from sqlalchemy import event
+
+    pragmas = dict(SQLITE_PRAGMAS)
+    pragmas.update(app.config.get('SQLITE_PRAGMAS', {}))
+
+    @event.listens_for(engine, 'connect')
+    def aplicar_pragmas(conexao_dbapi, _registro):
+        cursor = conexao_dbapi.cursor()
+        for pragma, valor in pragmas.items():
+            cursor.execute(f"PRAGMA {pragma} = {valor}")
+        cursor.close()
+
+    # Conexões abertas antes do registro do evento não receberiam os PRAGMAs
+    engine.dispose()
+
+    with engine.connect() as conexao:
+        efetivos = {pragma: conexao.exec_driver_sql(f"PRAGMA {pragma}").scalar()
+                    for pragma in pragmas}
+    app.logger.info("SQLite: %s; pool %s",
+                    ', '.join(f"{p}={v}" for p, v in efetivos.items()),
+                    engine.pool.status())
+
+
+def converter_uuids(valores) -> list[uuid.UUID]:
+    """Converte os valores para UUID, ignorando os inválidos"""
+    convertidos = []
+    for valor in valores:
+        try:
+            convertidos.append(uuid.UUID(str(valor)))
+        except (ValueError, AttributeError):
+            continue
+    return convertidos
+
+
 def timestamp():
     return datetime.datetime.now(tz=pytz.timezone('UTC'))
 
@@ -0,0 +1,334 @@
+"""
+Benchmark das rotas mais usadas de produtos e categorias.
+
+Cria um banco SQLite temporário com as migrações do Alembic, popula-o com um
+catálogo sintético e mede, com o cliente de testes do Flask e a aplicação
+criada por create_app, a latência (percentis) e a quantidade de consultas SQL
+de cada rota. O resultado é gravado em JSON, para comparar execuções:
+
+    python -m benchmarks.desempenho --produtos 20000 --saida antes.json
+    python -m benchmarks.desempenho --produtos 20000 --saida depois.json --comparar antes.json
+"""
+import argparse
+import io
+import json
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import sqlalchemy as sa
+from flask import url_for
+from PIL import Image
+
+from suporte.aplicacao import criar_aplicacao
+
+PERCENTIS = (50, 90, 95, 99)
+NOMES = ["Arroz", "Feijão", "Café", "Leite", "Queijo", "Pão", "Suco", "Biscoito",
+         "Manteiga", "Iogurte", "Farinha", "Açúcar", "Tomate", "Banana", "Frango"]
+ADJETIVOS = ["integral", "orgânico", "light", "tradicional", "premium", "caseiro",
+             "zero", "temperado", "fatiado", "congelado"]
+
+
+def gerar_fotos(quantidade: int, rng: random.Random) -> list[bytes]:
+    fotos = []
+    for _ in range(quantidade):
+        imagem = Image.new('RGB', (1200, 900), tuple(rng.randrange(256) for _ in range(3)))
+        for _ in range(20):
+            x, y = rng.randrange(1100), rng.randrange(800)
+            imagem.paste(tuple(rng.randrange(256) for _ in range(3)), (x, y, x + 100, y + 100))
+        saida = io.BytesIO()
+        imagem.save(saida, format='JPEG', quality=85)
+        fotos.append(saida.getvalue())
+    return fotos
+
+
+def semear(app, parametros, rng: random.Random) -> dict:
+    """
+    Popula o banco com o catálogo sintético. Além das categorias normais, cria
+    uma categoria descartável por repetição do cenário de remoção
+    """
+    from app.imagens.ingestao import ingerir
+    from app.models.categoria import Categoria
+    from app.models.juncoes import ProdutoCategoria
+    from app.models.produto import Produto
+    from app.modules import db, fotos
+
+    lote = 5000
+    with app.app_context():
+        categorias = [uuid.uuid4() for _ in range(parametros.categorias)]
+        descartaveis = [uuid.uuid4() for _ in range(parametros.repeticoes + parametros.aquecimento)]
+        db.session.execute(sa.insert(Categoria), [
+            {'id': categoria_id, 'nome': f"Categoria {i:04d}"}
+            for i, categoria_id in enumerate(categorias)
+        ] + [
+            {'id': categoria_id, 'nome': f"Descartável {i:04d}"}
+            for i, categoria_id in enumerate(descartaveis)
+        ])
+
+        ingeridas = [ingerir(io.BytesIO(conteudo)) for conteudo in gerar_fotos(10, rng)]
+        armazenadas = [(foto, fotos.put(foto.conteudo)) for foto in ingeridas]
+
+        produtos_com_foto = []
+        ids = []
+        for inicio in range(0, parametros.produtos, lote):
+            linhas, juncoes = [], []
+            for i in range(inicio, min(inicio + lote, parametros.produtos)):
+                produto_id = uuid.uuid4()
+                ids.append(produto_id)
+                linha = {'id': produto_id,
+                         'nome': f"{rng.choice(NOMES)} {rng.choice(ADJETIVOS)} {i}",
+                         'preco': round(rng.uniform(1, 200), 2),
+                         'estoque': rng.randrange(0, 500),
+                         'ativo': rng.random() < 0.9,
+                         'possui_foto': False, 'foto_base64': None, 'foto_mime': None,
+                         'foto_hash': None, 'foto_tamanho_original': None, 'foto_tamanho': None}
+                if rng.random() < parametros.fotos:
+                    foto, foto_hash = rng.choice(armazenadas)
+                    linha.update(possui_foto=True, foto_mime=foto.mime, foto_hash=foto_hash,
+                                 foto_tamanho_original=foto.tamanho_original,
+                                 foto_tamanho=foto.tamanho)
+                    produtos_com_foto.append(produto_id)
+                linhas.append(linha)
+                quantas = rng.randint(1, min(parametros.fanout, len(categorias)))
+                juncoes.extend({'produto_id': produto_id, 'categoria_id': categoria_id}
+                               for categoria_id in rng.sample(categorias, quantas))
+            db.session.execute(sa.insert(Produto), linhas)
+            db.session.execute(sa.insert(ProdutoCategoria), juncoes)
+
+        # As descartáveis recebem produtos que já têm outra categoria, então
+        # podem ser removidas
+        tamanho = max(1, parametros.produtos * parametros.fanout // (2 * parametros.categorias))
+        for categoria_id in descartaveis:
+            db.session.execute(sa.insert(ProdutoCategoria), [
+                {'produto_id': produto_id, 'categoria_id': categoria_id}
+                for produto_id in rng.sample(ids, min(tamanho, len(ids)))
+            ])
+        db.session.commit()
+
+    return {'categorias': categorias, 'descartaveis': descartaveis,
+            'produtos': ids, 'produtos_com_foto': produtos_com_foto}
+
+
+def percentil(valores: list[float], p: float) -> float:
+    """Percentil pelo método do posto mais próximo"""
+    ordenados = sorted(valores)
+    posto = max(1, -(-len(ordenados) * p // 100))
+    return ordenados[int(posto) - 1]
+
+
+def resumir(latencias: list[float], consultas: list[int], status: list[int]) -> dict:
+    return {
+        'latencia_ms': {
+            'min': round(min(latencias), 3),
+            'media': round(sum(latencias) / len(latencias), 3),
+            **{f"p{p}": round(percentil(latencias, p), 3) for p in PERCENTIS},
+            'max': round(max(latencias), 3),
+        },
+        'consultas': {
+            'min': min(consultas),
+            'mediana': percentil(consultas, 50),
+            'max': max(consultas),
+        },
+        'status': sorted(set(status)),
+    }
+
+
+def medir(app, requisicao, parametros, preparar=None) -> dict:
+    """
+    Executa ``requisicao(i)`` (que devolve a resposta do cliente de testes)
+    aquecimento + repetições vezes. Só as repetições entram no resultado;
+    ``preparar(i)`` roda antes de cada uma, fora da medição
+    """
+    from app.modules import db
+
+    contador = [0]
+
+    def contar(*_args, **_kwargs):
+        contador[0] += 1
+
+    latencias, consultas, status = [], [], []
+    with app.app_context():
+        motor = db.engine
+    sa.event.listen(motor, 'before_cursor_execute', contar)
+    try:
+        for i in range(parametros.aquecimento + parametros.repeticoes):
+            if preparar is not None:
+                preparar(i)
+            contador[0] = 0
+            inicio = time.perf_counter()
+            resposta = requisicao(i)
+            resposta.get_data()  # consome respostas em streaming
+            decorrido = (time.perf_counter() - inicio) * 1000
+            resposta.close()
+            if i >= parametros.aquecimento:
+                latencias.append(decorrido)
+                consultas.append(contador[0])
+                status.append(resposta.status_code)
+    finally:
+        sa.event.remove(motor, 'before_cursor_execute', contar)
+    return resumir(latencias, consultas, status)
+
+
+def cenarios(app, dados: dict):
+    """
+    Lista (nome, url, requisicao, preparar) dos cenários, na ordem de execução
+    """
+    from app.modules import thumbnail_cache
+
+    cliente = app.test_client()
+    categorias = [str(categoria_id) for categoria_id in dados['categorias']]
+    com_foto = dados['produtos_com_foto'] or dados['produtos']
+    paginas = max(1, len(dados['produtos']) // 25)
+
+    def url(endpoint, **valores):
+        with app.test_request_context():
+            return url_for(endpoint, **valores)
+
+    def foto(i):
+        return com_foto[i % len(com_foto)]
+
+    etags = {}
+
+    def preparar_condicional(i):
+        if foto(i) not in etags:
+            resposta = cliente.get(url('produto.imagem', id_produto=foto(i)))
+            etags[foto(i)] = resposta.headers['ETag']
+            resposta.close()
+
+    lista_cenarios = [
+        ('produto.lista', url('produto.lista', page=1, pp=25),
+         lambda i: cliente.get(url('produto.lista', page=1, pp=25)), None),
+        ('produto.lista (página profunda)', url('produto.lista', page=paginas // 2, pp=25),
+         lambda i: cliente.get(url('produto.lista', page=paginas // 2, pp=25)), None),
+        ('produto.lista (filtrada)', url('produto.lista', pp=25),
+         lambda i: cliente.post(url('produto.lista', pp=25), data={'cat': categorias[:3]}), None),
+        ('produto.lista (pp=all)', url('produto.lista', pp='all'),
+         lambda i: cliente.get(url('produto.lista', pp='all')), None),
+        ('categoria.lista', url('categoria.lista'),
+         lambda i: cliente.get(url('categoria.lista')), None),
+        ('categoria.edit', url('categoria.edit', id_categoria=categorias[0]),
+         lambda i: cliente.get(url('categoria.edit', id_categoria=categorias[i % len(categorias)])),
+         None),
+        ('categoria.remove (bloqueada)', url('categoria.remove', id_categoria=categorias[0]),
+         lambda i: cliente.post(url('categoria.remove', id_categoria=categorias[i % len(categorias)])),
+         None),
+        ('produto.imagem', url('produto.imagem', id_produto=com_foto[0]),
+         lambda i: cliente.get(url('produto.imagem', id_produto=foto(i))), None),
+        ('produto.imagem (304)', url('produto.imagem', id_produto=com_foto[0]),
+         lambda i: cliente.get(url('produto.imagem', id_produto=foto(i)),
+                               headers={'If-None-Match': etags[foto(i)]}),
+         preparar_condicional),
+        ('produto.thumbnail (sem cache)', url('produto.thumbnail', id_produto=com_foto[0], size=128),
+         lambda i: cliente.get(url('produto.thumbnail', id_produto=foto(i), size=128)),
+         lambda i: thumbnail_cache.invalidate(foto(i))),
+        ('produto.thumbnail (em cache)', url('produto.thumbnail', id_produto=com_foto[0], size=128),
+         lambda i: cliente.get(url('produto.thumbnail', id_produto=foto(i), size=128)), None),
+        # Destrutivo: cada repetição remove uma categoria descartável
+        ('categoria.remove', url('categoria.remove', id_categoria=dados['descartaveis'][0]),
+         lambda i: cliente.post(url('categoria.remove', id_categoria=dados['descartaveis'][i])),
+         None),
+    ]
+    return lista_cenarios
+
+
+def executar(parametros) -> dict:
+    rng = random.Random(parametros.semente)
+    diretorio = Path(tempfile.mkdtemp(prefix='benchmark-'))
+    try:
+        app = criar_aplicacao(diretorio, parametros.config)
+        inicio = time.perf_counter()
+        dados = semear(app, parametros, rng)
+        semeadura = time.perf_counter() - inicio
+        print(f"Banco populado em {semeadura:.1f}s ({diretorio})", file=sys.stderr)
+
+        lista_cenarios = cenarios(app, dados)
+        resultados = {}
+        for nome, url, requisicao, preparar in lista_cenarios:
+            resultados[nome] = {'url': url,
+                                **medir(app, requisicao, parametros, preparar)}
+            latencia = resultados[nome]['latencia_ms']
+            print(f"{nome:<34} p50 {latencia['p50']:>9.2f} ms   p95 {latencia['p95']:>9.2f} ms"
+                  f"   consultas {resultados[nome]['consultas']['mediana']}", file=sys.stderr)
+    finally:
+        if parametros.manter:
+            print(f"Banco mantido em {diretorio}", file=sys.stderr)
+        else:
+            shutil.rmtree(diretorio, ignore_errors=True)
+
+    return {
+        'data': datetime.now(tz=timezone.utc).isoformat(timespec='seconds'),
+        'parametros': {'produtos': parametros.produtos,
+                       'categorias': parametros.categorias,
+                       'fanout': parametros.fanout,
+                       'fotos': parametros.fotos,
+                       'repeticoes': parametros.repeticoes,
+                       'aquecimento': parametros.aquecimento,
+                       'semente': parametros.semente,
+                       'config': parametros.config},
+        'ambiente': {'python': platform.python_version(),
+                     'sqlite': sqlite3.sqlite_version,
+                     'sqlalchemy': sa.__version__,
+                     'plataforma': platform.platform()},
+        'semeadura_s': round(semeadura, 3),
+        'cenarios': resultados,
+    }
+
+
+def comparar(atual: dict, anterior: dict):
+    """Mostra a variação de p50, p95 e consultas em relação a uma execução anterior"""
+    if atual['parametros'] != anterior['parametros']:
+        print("Atenção: as execuções usaram parâmetros diferentes", file=sys.stderr)
+    print(f"{'cenário':<34} {'p50':>18} {'p95':>18} {'consultas':>12}", file=sys.stderr)
+    for nome, resultado in atual['cenarios'].items():
+        if nome not in anterior['cenarios']:
+            continue
+        antes = anterior['cenarios'][nome]
+        colunas = []
+        for chave in ('p50', 'p95'):
+            de, para = antes['latencia_ms'][chave], resultado['latencia_ms'][chave]
+            variacao = (para - de) / de * 100 if de else 0.0
+            colunas.append(f"{para:>8.2f} ({variacao:+6.1f}%)")
+        consultas = f"{antes['consultas']['mediana']} → {resultado['consultas']['mediana']}"
+        print(f"{nome:<34} {colunas[0]:>18} {colunas[1]:>18} {consultas:>12}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--produtos', type=int, default=10000)
+    parser.add_argument('--categorias', type=int, default=50)
+    parser.add_argument('--fanout', type=int, default=3,
+                        help="máximo de categorias por produto (cada um recebe de 1 a fanout)")
+    parser.add_argument('--fotos', type=float, default=0.2,
+                        help="fração dos produtos com foto")
+    parser.add_argument('--repeticoes', type=int, default=30)
+    parser.add_argument('--aquecimento', type=int, default=3)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--config', default='config.dev.json',
+                        help="arquivo de configuração da instância usado como base")
+    parser.add_argument('--saida', type=Path,
+                        help="arquivo JSON com os resultados (padrão: saída padrão)")
+    parser.add_argument('--comparar', type=Path,
+                        help="resultado JSON de uma execução anterior")
+    parser.add_argument('--manter', action='store_true',
+                        help="não apaga o banco temporário ao final")
+    parametros = parser.parse_args(argv)
+
+    resultado = executar(parametros)
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if parametros.saida:
+        parametros.saida.write_text(texto + '\n', encoding='utf-8')
+    else:
+        print(texto)
+    if parametros.comparar:
+        comparar(resultado, json.loads(parametros.comparar.read_text(encoding='utf-8')))
+
+
+if __name__ == '__main__':
+    main()
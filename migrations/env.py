@@ -22,6 +22,15 @@ from app.models.juncoes import ProdutoCategoria
 from app.modules import Base
 target_metadata = Base.metadata
 
+
+def include_name(name, type_, parent_names) -> bool:
+    # O índice de busca textual (tabela virtual FTS5 e suas tabelas internas)
+    # é mantido pelas migrações, e não pelos modelos
+    if type_ == "table":
+        return not name.startswith("produtos_fts")
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -44,6 +53,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -67,7 +77,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_name=include_name
         )
 
         with context.begin_transaction():
@@ -0,0 +1,52 @@
+"""Hash do conteúdo da foto
+
+Revision ID: 3c9e1f2a7b41
+Revises: 8fade6ab4d2b
+Create Date: 2026-10-18 09:12:40.118302
+
+"""
+import hashlib
+from base64 import b64decode
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9e1f2a7b41'
+down_revision: Union[str, Sequence[str], None] = '8fade6ab4d2b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('produtos') as batch_op:
+        batch_op.add_column(sa.Column('foto_hash', sa.String(length=64), nullable=True))
+
+    # Calcular o hash das fotos já cadastradas
+    conexao = op.get_bind()
+    produtos = sa.table('produtos',
+                        sa.column('id', sa.Uuid()),
+                        sa.column('foto_base64', sa.Text()),
+                        sa.column('foto_hash', sa.String(64)))
+    # Uma foto por vez, para não carregar todas na memória
+    ids = conexao.execute(
+        sa.select(produtos.c.id).where(produtos.c.foto_base64.is_not(None))
+    ).scalars().all()
+    for produto_id in ids:
+        foto_base64 = conexao.execute(
+            sa.select(produtos.c.foto_base64).where(produtos.c.id == produto_id)
+        ).scalar_one()
+        conexao.execute(
+            produtos.update().
+            where(produtos.c.id == produto_id).
+            values(foto_hash=hashlib.sha256(b64decode(foto_base64)).hexdigest())
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('produtos') as batch_op:
+        batch_op.drop_column('foto_hash')
@@ -0,0 +1,58 @@
+"""Busca textual (FTS5) no nome dos produtos
+
+Revision ID: 5b8f0d3e9c27
+Revises: e41b7c9d2a63
+Create Date: 2026-10-18 13:41:52.006418
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8f0d3e9c27'
+down_revision: Union[str, Sequence[str], None] = 'e41b7c9d2a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Índice FTS5 de conteúdo externo: o texto fica apenas na tabela de
+    # produtos, e o índice é mantido pelos gatilhos abaixo
+    op.execute("""
+        CREATE VIRTUAL TABLE produtos_fts USING fts5(
+            nome,
+            content='produtos',
+            content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER produtos_fts_ai AFTER INSERT ON produtos BEGIN
+            INSERT INTO produtos_fts(rowid, nome) VALUES (new.rowid, new.nome);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER produtos_fts_ad AFTER DELETE ON produtos BEGIN
+            INSERT INTO produtos_fts(produtos_fts, rowid, nome) VALUES ('delete', old.rowid, old.nome);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER produtos_fts_au AFTER UPDATE OF nome ON produtos BEGIN
+            INSERT INTO produtos_fts(produtos_fts, rowid, nome) VALUES ('delete', old.rowid, old.nome);
+            INSERT INTO produtos_fts(rowid, nome) VALUES (new.rowid, new.nome);
+        END
+    """)
+    # Indexar os produtos já cadastrados
+    op.execute("INSERT INTO produtos_fts(produtos_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS produtos_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS produtos_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS produtos_fts_ai")
+    op.execute("DROP TABLE IF EXISTS produtos_fts")
@@ -0,0 +1,87 @@
+"""Índice de busca textual referenciando o id dos produtos
+
+Revision ID: 9a4c6e1d7b35
+Revises: c2e6a4f81d95
+Create Date: 2026-10-18 16:20:11.503917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4c6e1d7b35'
+down_revision: Union[str, Sequence[str], None] = 'c2e6a4f81d95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _remover_indice() -> None:
+    op.execute("DROP TRIGGER IF EXISTS produtos_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS produtos_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS produtos_fts_ai")
+    op.execute("DROP TABLE IF EXISTS produtos_fts")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # O índice de conteúdo externo era ligado ao rowid implícito dos produtos,
+    # que muda quando a tabela é recriada (batch_alter_table, VACUUM). Agora o
+    # índice guarda o id do produto e o próprio texto
+    _remover_indice()
+    op.execute("""
+        CREATE VIRTUAL TABLE produtos_fts USING fts5(
+            produto_id UNINDEXED,
+            nome,
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER produtos_fts_ai AFTER INSERT ON produtos BEGIN
+            INSERT INTO produtos_fts(produto_id, nome) VALUES (new.id, new.nome);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER produtos_fts_ad AFTER DELETE ON produtos BEGIN
+            DELETE FROM produtos_fts WHERE produto_id = old.id;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER produtos_fts_au AFTER UPDATE OF id, nome ON produtos BEGIN
+            DELETE FROM produtos_fts WHERE produto_id = old.id;
+            INSERT INTO produtos_fts(produto_id, nome) VALUES (new.id, new.nome);
+        END
+    """)
+    op.execute("INSERT INTO produtos_fts(produto_id, nome) SELECT id, nome FROM produtos")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _remover_indice()
+    op.execute("""
+        CREATE VIRTUAL TABLE produtos_fts USING fts5(
+            nome,
+            content='produtos',
+            content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER produtos_fts_ai AFTER INSERT ON produtos BEGIN
+            INSERT INTO produtos_fts(rowid, nome) VALUES (new.rowid, new.nome);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER produtos_fts_ad AFTER DELETE ON produtos BEGIN
+            INSERT INTO produtos_fts(produtos_fts, rowid, nome) VALUES ('delete', old.rowid, old.nome);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER produtos_fts_au AFTER UPDATE OF nome ON produtos BEGIN
+            INSERT INTO produtos_fts(produtos_fts, rowid, nome) VALUES ('delete', old.rowid, old.nome);
+            INSERT INTO produtos_fts(rowid, nome) VALUES (new.rowid, new.nome);
+        END
+    """)
+    op.execute("INSERT INTO produtos_fts(produtos_fts) VALUES ('rebuild')")
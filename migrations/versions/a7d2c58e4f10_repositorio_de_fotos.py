@@ -0,0 +1,31 @@
+"""Repositório de fotos
+
+Revision ID: a7d2c58e4f10
+Revises: 3c9e1f2a7b41
+Create Date: 2026-10-18 10:03:21.540117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d2c58e4f10'
+down_revision: Union[str, Sequence[str], None] = '3c9e1f2a7b41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # As fotos passam a ser referenciadas pelo hash do conteúdo. O conteúdo
+    # em base64 das linhas existentes é transferido para o repositório de
+    # fotos pelo comando "flask fotos migrar"
+    op.create_index(op.f('ix_produtos_foto_hash'), 'produtos', ['foto_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_produtos_foto_hash'), table_name='produtos')
@@ -0,0 +1,32 @@
+"""Tamanho original e armazenado das fotos
+
+Revision ID: c2e6a4f81d95
+Revises: 5b8f0d3e9c27
+Create Date: 2026-10-18 15:02:37.284410
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2e6a4f81d95'
+down_revision: Union[str, Sequence[str], None] = '5b8f0d3e9c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ADD COLUMN direto (sem batch_alter_table): recriar a tabela de produtos
+    # mudaria os rowids usados pelo índice de busca textual
+    op.add_column('produtos', sa.Column('foto_tamanho_original', sa.Integer(), nullable=True))
+    op.add_column('produtos', sa.Column('foto_tamanho', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('produtos', 'foto_tamanho')
+    op.drop_column('produtos', 'foto_tamanho_original')
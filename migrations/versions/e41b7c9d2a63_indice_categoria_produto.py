@@ -0,0 +1,29 @@
+"""Índice (categoria_id, produto_id) na junção
+
+Revision ID: e41b7c9d2a63
+Revises: a7d2c58e4f10
+Create Date: 2026-10-18 11:20:05.731904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41b7c9d2a63'
+down_revision: Union[str, Sequence[str], None] = 'a7d2c58e4f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_produto_categoria_categoria_id', 'produto_categoria',
+                    ['categoria_id', 'produto_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_produto_categoria_categoria_id', table_name='produto_categoria')
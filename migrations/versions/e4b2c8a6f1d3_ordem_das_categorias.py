@@ -0,0 +1,53 @@
+"""Ordem permanente das categorias, usada no filtro guardado na sessão
+
+Revision ID: e4b2c8a6f1d3
+Revises: 9a4c6e1d7b35
+Create Date: 2026-10-18 16:48:52.117304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b2c8a6f1d3'
+down_revision: Union[str, Sequence[str], None] = '9a4c6e1d7b35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # O filtro de categorias guardado na sessão tem um bit por categoria,
+    # na posição da sua ordem. A ordem era o rowid, que muda quando a tabela
+    # é recriada; os filtros já guardados continuam válidos
+    op.add_column('categorias', sa.Column('ordem', sa.Integer(), nullable=True))
+    op.execute("UPDATE categorias SET ordem = rowid")
+    op.create_index(op.f('ix_categorias_ordem'), 'categorias', ['ordem'], unique=True)
+
+    # A sequência (AUTOINCREMENT) nunca reaproveita um número, nem o da
+    # categoria incluída por último, se ela for removida
+    op.execute("CREATE TABLE categorias_ordem (ordem INTEGER PRIMARY KEY AUTOINCREMENT)")
+    op.execute("""
+        INSERT INTO categorias_ordem(ordem)
+        SELECT max(ordem) FROM categorias HAVING max(ordem) IS NOT NULL
+    """)
+    op.execute("DELETE FROM categorias_ordem")
+    op.execute("""
+        CREATE TRIGGER categorias_ordem_ai AFTER INSERT ON categorias
+        WHEN new.ordem IS NULL BEGIN
+            INSERT INTO categorias_ordem(ordem) VALUES (NULL);
+            UPDATE categorias SET ordem = last_insert_rowid() WHERE id = new.id;
+            DELETE FROM categorias_ordem;
+        END
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS categorias_ordem_ai")
+    op.execute("DROP TABLE IF EXISTS categorias_ordem")
+    op.drop_index(op.f('ix_categorias_ordem'), table_name='categorias')
+    op.drop_column('categorias', 'ordem')
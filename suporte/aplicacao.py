@@ -0,0 +1,47 @@
+"""
+Apoio aos testes (tests/) e ao benchmark (benchmarks/): a aplicação real,
+criada por create_app, com um banco novo e todos os arquivos em um diretório
+temporário
+"""
+import json
+import logging
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+
+def criar_aplicacao(diretorio: Path, base: str = 'config.dev.json'):
+    """
+    Aplicação (create_app) com a configuração ``instance/<base>``, apontando
+    para um banco novo, migrado pelo Alembic, em ``diretorio``. Todos os
+    caminhos da configuração são absolutos, dentro de ``diretorio``: nada vai
+    para a pasta da instância
+    """
+    banco = diretorio / 'aplicacao.sqlite3'
+    uri = f"sqlite+pysqlite:///{banco}"
+
+    alembic = Config(str(RAIZ / 'alembic.ini'))
+    alembic.set_main_option('sqlalchemy.url', uri)
+    command.upgrade(alembic, 'head')
+
+    with open(RAIZ / 'instance' / base, encoding='utf-8') as arquivo:
+        configuracao = json.load(arquivo)
+    configuracao.update({
+        'SQLITE_DB_NAME': str(banco),
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'FOTO_STORE_PATH': str(diretorio / 'fotos'),
+        'THUMBNAIL_CACHE_DIR': str(diretorio / 'thumbnails'),
+        'CATEGORIAS_GERACAO_ARQUIVO': str(diretorio / 'categorias.geracao'),
+        'INSTRUMENTACAO_PERFIL_DIR': str(diretorio / 'perfis'),
+        'WTF_CSRF_ENABLED': False,
+    })
+    arquivo_configuracao = diretorio / 'config.json'
+    arquivo_configuracao.write_text(json.dumps(configuracao), encoding='utf-8')
+
+    from app import create_app
+    app = create_app(str(arquivo_configuracao))
+    app.logger.setLevel(logging.WARNING)
+    return app
@@ -0,0 +1,70 @@
+import uuid
+
+import pytest
+import sqlalchemy as sa
+
+from suporte.aplicacao import criar_aplicacao
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """Aplicação (create_app) com um banco novo, migrado pelo Alembic"""
+    return criar_aplicacao(tmp_path_factory.mktemp('instancia'), 'config.dev.json')
+
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def criar_produtos(app):
+    """
+    Função que inclui ``quantidade`` produtos, cada um associado a todas as
+    ``categorias`` (novas) criadas para ele, e devolve os ids dos produtos
+    """
+    from app.models.categoria import Categoria
+    from app.models.juncoes import ProdutoCategoria
+    from app.models.produto import Produto
+    from app.modules import db
+
+    def criar(quantidade: int, categorias: int = 2, estoque: int = 0,
+              foto_base64: str | None = None) -> list[uuid.UUID]:
+        categorias_ids = [uuid.uuid4() for _ in range(categorias)]
+        produtos_ids = [uuid.uuid4() for _ in range(quantidade)]
+        with app.app_context():
+            db.session.execute(sa.insert(Categoria), [
+                {'id': categoria_id, 'nome': f"Categoria {categoria_id.hex[:8]}"}
+                for categoria_id in categorias_ids
+            ])
+            db.session.execute(sa.insert(Produto), [
+                {'id': produto_id, 'nome': f"Produto {produto_id.hex[:8]}", 'preco': 10,
+                 'estoque': estoque, 'ativo': True, 'possui_foto': foto_base64 is not None,
+                 'foto_base64': foto_base64, 'foto_mime': foto_base64 and 'image/png'}
+                for produto_id in produtos_ids
+            ])
+            db.session.execute(sa.insert(ProdutoCategoria), [
+                {'produto_id': produto_id, 'categoria_id': categoria_id}
+                for produto_id in produtos_ids for categoria_id in categorias_ids
+            ])
+            db.session.commit()
+        return produtos_ids
+
+    return criar
+
+
+@pytest.fixture
+def consultas(app):
+    """Lista das sentenças SQL executadas pelo engine durante o teste"""
+    from app.modules import db
+
+    sentencas = []
+
+    def registrar(_conexao, _cursor, sentenca, *_args):
+        sentencas.append(sentenca)
+
+    with app.app_context():
+        motor = db.engine
+    sa.event.listen(motor, 'before_cursor_execute', registrar)
+    yield sentencas
+    sa.event.remove(motor, 'before_cursor_execute', registrar)
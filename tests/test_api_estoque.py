@@ -0,0 +1,43 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+def test_movimentos_concorrentes_nao_perdem_atualizacoes(app, criar_produtos):
+    from app.models.produto import Produto
+    from app.modules import db
+
+    produto_id = criar_produtos(1, estoque=100)[0]
+
+    def retirar(_):
+        resposta = app.test_client().post(f'/api/produtos/{produto_id}/estoque',
+                                          json={'quantidade': -1})
+        return resposta.status_code
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        status = Counter(executor.map(retirar, range(200)))
+
+    assert status == {200: 100, 409: 100}
+    with app.app_context():
+        assert db.session.get(Produto, produto_id).estoque == 0
+
+
+def test_lote_atomico_desfaz_tudo_quando_ha_rejeicao(app, cliente, criar_produtos):
+    from app.models.produto import Produto
+    from app.modules import db
+
+    com_estoque, sem_estoque = criar_produtos(2, estoque=5)
+    resposta = cliente.post('/api/estoque/movimentos', json={
+        'movimentos': [{'produto': str(com_estoque), 'quantidade': -5},
+                       {'produto': str(sem_estoque), 'quantidade': -6}],
+        'atomico': True,
+    })
+    assert resposta.status_code == 409
+    assert [r['indice'] for r in resposta.json['rejeitados']] == [1]
+    with app.app_context():
+        assert db.session.get(Produto, com_estoque).estoque == 5
+
+
+def test_quantidade_fora_da_faixa(cliente, criar_produtos):
+    produto_id = criar_produtos(1)[0]
+    resposta = cliente.post(f'/api/produtos/{produto_id}/estoque', json={'quantidade': 10 ** 30})
+    assert resposta.status_code == 400
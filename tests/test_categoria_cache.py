@@ -0,0 +1,46 @@
+import uuid
+
+import sqlalchemy as sa
+
+
+def _incluir_categoria(app) -> str:
+    from app.models.categoria import Categoria
+    from app.modules import db
+
+    with app.app_context():
+        categoria = Categoria(id=uuid.uuid4(), nome=f"Categoria {uuid.uuid4().hex[:8]}")
+        db.session.add(categoria)
+        db.session.commit()
+        return str(categoria.id)
+
+
+def test_filtro_guardado_sobrevive_a_recriacao_da_tabela(app):
+    from app.models.categoria import Categoria
+    from app.modules import categoria_cache, db
+
+    selecionada, outra = _incluir_categoria(app), _incluir_categoria(app)
+    with app.app_context():
+        filtro = categoria_cache.snapshot().codificar({selecionada})
+        # Como faria uma migração que recria a tabela de categorias
+        db.session.execute(sa.text("UPDATE categorias SET rowid = rowid + 1000"))
+        db.session.execute(sa.update(Categoria).where(Categoria.id == uuid.UUID(outra)).
+                           values(nome=f"Renomeada {outra[:8]}"))
+        db.session.commit()
+        assert categoria_cache.snapshot().decodificar(filtro) == {selecionada}
+
+
+def test_ordem_da_categoria_removida_nao_e_reaproveitada(app):
+    from app.models.categoria import Categoria
+    from app.modules import categoria_cache, db
+
+    _incluir_categoria(app)
+    removida = _incluir_categoria(app)
+    with app.app_context():
+        filtro = categoria_cache.snapshot().codificar({removida})
+        db.session.execute(sa.delete(Categoria).where(Categoria.id == uuid.UUID(removida)))
+        db.session.commit()
+    nova = _incluir_categoria(app)
+    with app.app_context():
+        snapshot = categoria_cache.snapshot()
+        assert nova in snapshot.ordinais
+        assert snapshot.decodificar(filtro) == snapshot.ids
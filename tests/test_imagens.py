@@ -0,0 +1,66 @@
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+
+@pytest.fixture
+def fuso():
+    """Função que troca o fuso horário do processo, restaurado ao final do teste"""
+    original = os.environ.get('TZ')
+
+    def trocar(nome: str):
+        os.environ['TZ'] = nome
+        time.tzset()
+
+    yield trocar
+    if original is None:
+        os.environ.pop('TZ', None)
+    else:
+        os.environ['TZ'] = original
+    time.tzset()
+
+
+def test_versao_da_foto_nao_depende_do_fuso_do_servidor(fuso):
+    from app.models.produto import Produto
+
+    dta = datetime(2026, 1, 1, 12)
+    versoes = set()
+    for nome in ('UTC', 'America/Sao_Paulo', 'Asia/Tokyo'):
+        fuso(nome)
+        versoes.add(Produto.versao_da_foto(None, dta))
+    assert len(versoes) == 1
+
+
+def test_movimento_de_estoque_nao_muda_a_versao_da_foto(app, cliente, criar_produtos):
+    from app.models.produto import Produto
+    from app.modules import db
+
+    produto_id = criar_produtos(1, estoque=5)[0]
+    with app.app_context():
+        db.session.execute(db.update(Produto).where(Produto.id == produto_id).
+                           values(foto_hash='ab' * 32, dta_atualizacao=datetime(2026, 1, 1)))
+        db.session.commit()
+        antes = db.session.get(Produto, produto_id).versao_foto
+
+    assert cliente.post(f'/api/produtos/{produto_id}/estoque',
+                        json={'quantidade': -1}).status_code == 200
+    with app.app_context():
+        produto = db.session.get(Produto, produto_id)
+        assert produto.dta_atualizacao != datetime(2026, 1, 1)
+        assert produto.versao_foto == antes
+
+
+def test_falha_ao_agendar_miniaturas_nao_propaga(app, monkeypatch):
+    from concurrent.futures.process import BrokenProcessPool
+
+    from app.modules import derivados
+
+    def executor_quebrado():
+        raise BrokenProcessPool("pool interrompido")
+
+    monkeypatch.setattr(derivados, '_executor', executor_quebrado)
+    derivados.agendar('produto', 'ab' * 32, b'')
+    assert derivados.status('produto', 'ab' * 32) == derivados.ERRO
+    derivados.descartar('produto')
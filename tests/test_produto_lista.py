@@ -0,0 +1,52 @@
+def _consultas_da_lista(cliente, consultas, pp) -> int:
+    consultas.clear()
+    resposta = cliente.get(f'/produto/lista?pp={pp}')
+    resposta.get_data()  # consome as respostas em streaming (pp=all)
+    resposta.close()
+    assert resposta.status_code == 200
+    return len(consultas)
+
+
+def test_lista_quantidade_de_consultas_nao_cresce_com_a_pagina(cliente, consultas,
+                                                               criar_produtos):
+    criar_produtos(60, categorias=3)
+    _consultas_da_lista(cliente, consultas, 5)  # carrega o cache de categorias
+    assert _consultas_da_lista(cliente, consultas, 50) == _consultas_da_lista(cliente, consultas, 5)
+
+
+def test_lista_completa_quantidade_de_consultas_nao_cresce_com_o_catalogo(cliente, consultas,
+                                                                          criar_produtos):
+    criar_produtos(20, categorias=3)
+    _consultas_da_lista(cliente, consultas, 'all')
+    antes = _consultas_da_lista(cliente, consultas, 'all')
+    criar_produtos(100, categorias=3)
+    _consultas_da_lista(cliente, consultas, 5)  # carrega o cache de categorias
+    assert _consultas_da_lista(cliente, consultas, 'all') == antes
+
+
+def test_listagens_nao_carregam_os_bytes_das_fotos(app, cliente, consultas, criar_produtos):
+    from app.models.juncoes import ProdutoCategoria
+    from app.modules import db
+
+    produto_id = criar_produtos(5, categorias=1, foto_base64='iVBORw0KGgo=')[0]
+    with app.app_context():
+        categoria_id = db.session.execute(
+            db.select(ProdutoCategoria.categoria_id).where(ProdutoCategoria.produto_id == produto_id)
+        ).scalar_one()
+
+    # A remoção da categoria é recusada (os produtos ficariam sem categoria)
+    for url in ('/produto/lista?pp=25', '/produto/lista?pp=all', '/api/produtos',
+                f'/produto/edit/{produto_id}', f'/categoria/edit/{categoria_id}',
+                f'/categoria/del/{categoria_id}'):
+        consultas.clear()
+        resposta = cliente.get(url)
+        resposta.get_data()
+        resposta.close()
+        assert resposta.status_code in (200, 302), url
+        assert consultas, url
+        assert not [c for c in consultas if 'foto_base64' in c], url
+
+    # As rotas de imagem carregam a foto
+    consultas.clear()
+    cliente.get(f'/produto/imagem/{produto_id}').close()
+    assert [c for c in consultas if 'foto_base64' in c]
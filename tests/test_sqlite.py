@@ -0,0 +1,58 @@
+import time
+
+
+def test_perfil_do_sqlite_aplicado_as_conexoes(app):
+    from app.modules import db
+
+    with app.app_context(), db.engine.connect() as conexao:
+        assert conexao.exec_driver_sql("PRAGMA journal_mode").scalar() == 'wal'
+        assert conexao.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+
+
+def test_leitura_em_andamento_nao_bloqueia_escrita(app, criar_produtos):
+    from app.models.produto import Produto
+    from app.modules import db
+
+    produto_id = criar_produtos(1, estoque=10)[0]
+    with app.app_context():
+        leitor = db.engine.raw_connection()
+    try:
+        # Transação de leitura aberta, como a de um worker no meio de uma listagem
+        leitor.isolation_level = None
+        cursor = leitor.cursor()
+        cursor.execute("BEGIN")
+        consulta = "SELECT estoque FROM produtos WHERE id = ?"
+        assert cursor.execute(consulta, (produto_id.hex,)).fetchone() == (10,)
+
+        # Sem o WAL, o commit esperaria o fim da leitura (busy_timeout) e
+        # falharia com "database is locked"
+        inicio = time.perf_counter()
+        with app.app_context():
+            assert Produto.movimentar_estoque(produto_id, -3) == 7
+            db.session.commit()
+        assert time.perf_counter() - inicio < 1
+
+        # A leitura continua vendo o seu retrato até terminar
+        assert cursor.execute(consulta, (produto_id.hex,)).fetchone() == (10,)
+        cursor.execute("COMMIT")
+        assert cursor.execute(consulta, (produto_id.hex,)).fetchone() == (7,)
+    finally:
+        leitor.isolation_level = ''
+        leitor.close()
+
+
+def test_busca_nao_depende_do_rowid_dos_produtos(app, cliente, criar_produtos):
+    from app.modules import db
+
+    produto_id = criar_produtos(1)[0]
+    with app.app_context(), db.engine.begin() as conexao:
+        # Como faria uma migração que recria a tabela de produtos
+        conexao.exec_driver_sql("UPDATE produtos SET rowid = rowid + 1000000 WHERE id = ?",
+                                (produto_id.hex,))
+
+    resposta = cliente.get(f'/api/produtos?q={produto_id.hex[:8]}')
+    assert resposta.status_code == 200
+    assert [item['id'] for item in resposta.get_json()['itens']] == [str(produto_id)]
+    resposta = cliente.get(f'/produto/lista?q={produto_id.hex[:8]}')
+    assert resposta.status_code == 200
+    assert str(produto_id) in resposta.get_data(as_text=True)
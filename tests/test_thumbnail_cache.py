@@ -0,0 +1,33 @@
+from flask import Flask
+
+from app.cache.thumbnails import ThumbnailCache
+
+
+def _cache(diretorio, limite: int, revarredura: float) -> ThumbnailCache:
+    app = Flask(__name__, instance_path=str(diretorio))
+    app.config.update(THUMBNAIL_CACHE_DIR=str(diretorio / 'thumbnails'),
+                      THUMBNAIL_CACHE_MAX_BYTES=limite,
+                      THUMBNAIL_CACHE_REVARREDURA=revarredura)
+    return ThumbnailCache(app)
+
+
+def _bytes_em_disco(diretorio) -> int:
+    return sum(arquivo.stat().st_size for arquivo in (diretorio / 'thumbnails').rglob('*')
+               if arquivo.is_file() and not arquivo.name.startswith('.'))
+
+
+def test_limite_vale_para_o_diretorio_compartilhado(tmp_path):
+    # Dois processos (workers) com o mesmo diretório
+    primeiro = _cache(tmp_path, 1000, revarredura=0)
+    segundo = _cache(tmp_path, 1000, revarredura=0)
+    for i in range(3):
+        primeiro.put('produto-a', 'ab' * 32, i, b'x' * 300)
+    for i in range(3):
+        segundo.put('produto-b', 'cd' * 32, i, b'x' * 300)
+        assert _bytes_em_disco(tmp_path) <= 1000
+
+    # A última miniatura gravada continua no cache, visível para o outro processo
+    assert primeiro.get('produto-b', 'cd' * 32, 2) is not None
+    estatisticas = segundo.stats()
+    assert estatisticas['bytes'] == _bytes_em_disco(tmp_path)
+    assert estatisticas['entradas'] == 3